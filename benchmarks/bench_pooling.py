@@ -0,0 +1,110 @@
+"""
+Benchmark for the pooled http session
+
+Runs ClickUp, VercelKV and LogflareLogger calls against a local stub server,
+once with the shared pooled session and once with the module level requests
+functions (new connection per call), and prints calls per second for both.
+
+usage 'python benchmarks/bench_pooling.py [calls]'
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package in ["httpsession", "instrumentation", "clickup", "vercelKV", "logflare"]:
+    sys.path.insert(0, os.path.join(ROOT, package))
+
+from httpsession.httpsession import PooledSession
+from clickup.clickup import ClickUp
+from clickup.ratelimit import RateLimiter
+from vercelKV.vercelKV import VercelKV
+from logflare.logflare import LogflareLogger
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive needs http/1.1, the default http/1.0 closes every connection
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, nagle would stall every reply
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        body = json.dumps({"id": "abc", "result": json.dumps({"value": "1"})}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(call, calls: int) -> float:
+    """Returns calls per second for running call() calls times"""
+    call()  # warm up
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return calls / (time.perf_counter() - start)
+
+
+def run(calls: int):
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["KV_REST_API_URL"] = url
+    os.environ["KV_REST_API_TOKEN"] = "token"
+
+    # the requests module has the same get/post/request surface as a session,
+    # so passing it in gives the old connection-per-call behaviour
+    transports = {"no pooling": requests, "pooled": PooledSession()}
+
+    for name, session in transports.items():
+        # own unlimited limiter, the shared one per api key would throttle the second run
+        clickup = ClickUp("x" * 43, url, session=session, rate_limiter=RateLimiter(limit=10**9))
+        kv = VercelKV(session=session)
+        logger = LogflareLogger("key", "drain", base_url=url, session=session)
+
+        def log_and_flush():
+            logger.info("bench")
+            logger.flush()
+
+        results = {
+            "ClickUp.get_task_by_id": measure(lambda: clickup.get_task_by_id("abc"), calls),
+            "VercelKV.delete": measure(lambda: kv.delete("key"), calls),
+            "LogflareLogger.flush": measure(log_and_flush, calls),
+        }
+
+        for call_name, per_second in results.items():
+            print(f"{name:>10} {call_name:<24} {per_second:10.1f} calls/s")
+
+        logger.exit()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv
+    run(int(args[1]) if len(args) > 1 else 500)
@@ -0,0 +1,120 @@
+"""
+Benchmark for VercelKV against the local emulator
+
+Runs set/get/delete through VercelKV (threads) and AsyncVercelKV (tasks) at
+each concurrency level and prints ops/sec with p50/p99 latency. With
+--fail-below the script exits with status 1 when any run is slower than the
+given ops/sec, so it can guard against regressions in CI.
+
+usage 'python benchmarks/bench_vercelkv.py [--ops N] [--latency S] [--concurrency 1 4 16] [--fail-below OPS]'
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package in ["httpsession", "instrumentation", "vercelKV"]:
+    sys.path.insert(0, os.path.join(ROOT, package))
+
+from httpsession.httpsession import PooledSession
+from vercelKV.emulator import KVEmulator
+from vercelKV.vercelKV import VercelKV
+
+
+def percentile(latencies: list, p: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(name: str, concurrency: int, latencies: list, elapsed: float) -> float:
+    ops_per_second = len(latencies) / elapsed
+    print(
+        f"{name:<6} concurrency {concurrency:>4} {ops_per_second:10.1f} ops/s"
+        f"  p50 {percentile(latencies, 0.5) * 1000:7.2f} ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:7.2f} ms"
+    )
+    return ops_per_second
+
+
+def operation(kv, i: int):
+    key = f"bench:{i % 100}"
+    if i % 3 == 0:
+        return kv.set(key, i)
+    if i % 3 == 1:
+        return kv.get(key)
+    return kv.delete(key)
+
+
+def run_sync(url: str, token: str, ops: int, concurrency: int) -> float:
+    kv = VercelKV(session=PooledSession(pool_size=concurrency), base_url=url, token=token)
+
+    def timed(i):
+        start = time.perf_counter()
+        operation(kv, i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(ops)))
+    return report("sync", concurrency, latencies, time.perf_counter() - start)
+
+
+async def run_async(url: str, token: str, ops: int, concurrency: int) -> float:
+    from vercelKV.asyncVercelKV import AsyncVercelKV
+
+    async with AsyncVercelKV(max_concurrency=concurrency, base_url=url, token=token) as kv:
+
+        latencies = []
+        counter = iter(range(ops))
+
+        # closed loop like the thread pool, concurrency workers each run one operation at a time
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                key = f"bench:{i % 100}"
+                if i % 3 == 0:
+                    await kv.set(key, i)
+                elif i % 3 == 1:
+                    await kv.get(key)
+                else:
+                    await kv.delete(key)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return report("async", concurrency, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VercelKV benchmark against the local emulator")
+    parser.add_argument("--ops", type=int, default=2000, help="operations per run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency the emulator adds to every request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--fail-below", type=float, default=None, help="exit with 1 if any run is below this many ops/s")
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+        run_async_too = True
+    except ImportError:
+        run_async_too = False
+        print("httpx is not installed, skipping AsyncVercelKV")
+
+    results = []
+    with KVEmulator(latency=args.latency) as emulator:
+        for concurrency in args.concurrency:
+            results.append(run_sync(emulator.url, emulator.token, args.ops, concurrency))
+            if run_async_too:
+                results.append(asyncio.run(run_async(emulator.url, emulator.token, args.ops, concurrency)))
+
+    if args.fail_below is not None and min(results) < args.fail_below:
+        print(f"slowest run {min(results):.1f} ops/s is below {args.fail_below} ops/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Asyncio version of the ClickUp wrapper.
+
+AsyncClickUp has the same methods as ClickUp, but they are coroutines running
+on httpx. A semaphore caps how many requests a single client has in flight, so
+hundreds of calls can be gathered from one event loop without opening hundreds
+of connections.
+
+Needs the async extra: pip install "clickup[async]"
+"""
+
+
+import asyncio
+from datetime import datetime
+
+import httpx
+from httpsession.asyncsession import create_async_client
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from clickup.clickup import ClickUp
+from clickup.ratelimit import RateLimiter, get_rate_limiter
+
+
+class AsyncClickUp:
+    WEBHOOK_EVENTS = ClickUp.WEBHOOK_EVENTS
+
+    def __init__(
+        self,
+        _api_key,
+        _api_url=None,
+        max_concurrency: int = 20,
+        client: httpx.AsyncClient = None,
+        rate_limiter: RateLimiter = None,
+        instrumentation: Instrumentation = None,
+    ) -> None:
+        if _api_url:
+            self.API_URL = _api_url
+        else:
+            self.API_URL = "https://api.clickup.com/api/v2"
+
+        if not _api_key:
+            raise Exception("Please provide api key to initialize api")
+        elif len(_api_key) != 43:
+            raise Exception("Provided api key is not correct")
+
+        self.API_KEY = _api_key
+
+        self.client = client if client is not None else create_async_client(max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        # same limiter as sync clients using the same key
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter(_api_key)
+
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
+    API_KEY = ""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        headers = {"Authorization": self.API_KEY}
+        if "json" in kwargs:
+            headers["Content-Type"] = "application/json"
+
+        with self.instrumentation.span(f"clickup.{method.lower()}") as span:
+            attempt = 0
+            while True:
+                await self.rate_limiter.acquire_async()
+                async with self.semaphore:
+                    resp = await self.client.request(
+                        method, url=f"{self.API_URL}{path}", headers=headers, **kwargs
+                    )
+                self.rate_limiter.update(resp.headers)
+
+                if not self.rate_limiter.should_retry(method, resp.status_code, attempt):
+                    break
+
+                await asyncio.sleep(self.rate_limiter.backoff(attempt))
+                attempt += 1
+
+            span.set("attempts", attempt + 1)
+            span.sent(len(resp.request.content))
+            span.received(len(resp.content))
+            if resp.status_code != 200:
+                span.fail(f"HTTP {resp.status_code}")
+
+        if resp.status_code != 200:
+            raise ValueError(
+                f"Server responded with error code {resp.status_code} {resp.content}"
+            )
+
+        return resp
+
+    async def create_folder(self, space_id: str, name: str) -> dict:
+        resp = await self._request("POST", f"/space/{str(space_id)}/folder", json={"name": name})
+        return resp.json()
+
+    async def create_list(self, folder_id: str, name: str) -> dict:
+        resp = await self._request("POST", f"/folder/{str(folder_id)}/list", json={"name": name})
+        return resp.json()
+
+    async def get_workspaces(self) -> dict:
+        resp = await self._request("GET", "/team/")
+        return resp.json()
+
+    async def get_workspace_by_name(self, name: str) -> dict:
+        data = await self.get_workspaces()
+
+        for team in data["teams"]:
+            if team["name"] == name:
+                return team
+
+        raise NameError(f"Workspace with name {name} was not found")
+
+    async def get_all_workspace_members(self, workspace_name: str) -> dict:
+        workspace = await self.get_workspace_by_name(name=workspace_name)
+        return workspace["members"]
+
+    async def get_workspace_spaces(self, workspace_id: int) -> dict:
+        resp = await self._request(
+            "GET", f"/team/{str(workspace_id)}/space", params={"archived": "false"}
+        )
+        return resp.json()["spaces"]
+
+    async def get_space_by_name(self, workspace_id: int, name: str) -> dict:
+        spaces = await self.get_workspace_spaces(workspace_id=workspace_id)
+
+        for space in spaces:
+            if space["name"] == name:
+                return space
+
+        raise NameError(
+            f"No space with name {name} was located in workspace with id {workspace_id}"
+        )
+
+    async def get_workspace_id_by_name(self, name: str) -> int:
+        return (await self.get_workspace_by_name(name))["id"]
+
+    async def get_space_folders(self, space_id: int) -> list:
+        resp = await self._request(
+            "GET", f"/space/{str(space_id)}/folder", params={"archived": "false"}
+        )
+        return resp.json()["folders"]
+
+    async def get_space_folder_by_name(self, space_id: int, name: str) -> dict:
+        folders = await self.get_space_folders(space_id)
+
+        for folder in folders:
+            if folder["name"] == name:
+                return folder
+
+        raise NameError(
+            f"No folder with name {name} was found in space with id {space_id}"
+        )
+
+    async def get_folder_lists(self, folder_id: int) -> list:
+        resp = await self._request(
+            "GET", f"/folder/{str(folder_id)}/list", params={"archived": "false"}
+        )
+        return resp.json()["lists"]
+
+    async def get_folder_list_by_name(self, folder_id: int, name: str) -> dict:
+        lists = await self.get_folder_lists(folder_id)
+
+        for list in lists:
+            if list["name"] == name:
+                return list
+
+        raise NameError(
+            f"No list with name {name} was found in a folder with id {folder_id}"
+        )
+
+    async def create_webhook(
+        self,
+        workspace_id: int,
+        endpoint: str,
+        events: list[str],
+        space_id: int = None,
+        folder_id: int = None,
+        list_id: int = None,
+        task_id: str = None,
+    ):
+        req_data = ClickUp._webhook_payload(
+            endpoint, events, space_id, folder_id, list_id, task_id
+        )
+
+        resp = await self._request("POST", f"/team/{workspace_id}/webhook", json=req_data)
+        return resp.json()
+
+    async def get_webhooks(self, workspace_id: str):
+        resp = await self._request("GET", f"/team/{workspace_id}/webhook")
+        return resp.json()
+
+    async def get_task_by_id(self, task_id: str):
+        resp = await self._request("GET", f"/task/{task_id}")
+        return resp.json()
+
+    async def delete_webhook_by_id(self, webhook_id: str):
+        resp = await self._request("DELETE", f"/webhook/{webhook_id}")
+        return resp.json()
+
+    async def add_comment_to_task(
+        self, task_id: str, comment: str, notify_all: bool = False, assignee: int = None
+    ):
+        payload = {"comment_text": comment, "notify_all": notify_all}
+        if assignee != None:
+            payload["assignee"] = assignee
+
+        await self._request("POST", f"/task/{str(task_id)}/comment", json=payload)
+
+        return True
+
+    async def set_custom_field_value(self, task_id: str, field_id: str, value):
+        await self._request("POST", f"/task/{task_id}/field/{field_id}", json={"value": value})
+
+        return True
+
+    async def create_task(
+        self,
+        list_id: int,
+        name: str,
+        description: str = None,
+        assignees: list[int] = None,
+        status: str = None,
+        priority: int = None,
+        due_date: datetime = None,
+        parent: str = None,
+        tags: list[str] = None,
+        custom_fields: dict = None,
+    ) -> dict:
+        req_data = ClickUp._task_payload(
+            name, description, assignees, status, priority, due_date, parent, tags, custom_fields
+        )
+
+        resp = await self._request("POST", f"/list/{str(list_id)}/task", json=req_data)
+        return resp.json()
+
+    async def create_tasks(self, list_id: int, specs: list[dict]) -> list:
+        """Same as ClickUp.create_tasks, concurrency is bounded by max_concurrency"""
+        return await asyncio.gather(
+            *[self.create_task(list_id, **spec) for spec in specs], return_exceptions=True
+        )
+
+    async def set_custom_field_values(self, values: list[tuple]) -> list:
+        """Same as ClickUp.set_custom_field_values, concurrency is bounded by max_concurrency"""
+        return await asyncio.gather(
+            *[self.set_custom_field_value(*value) for value in values], return_exceptions=True
+        )
+
+    async def _iter_pages(self, fetch, cursor):
+        # same as ClickUp._iter_pages, the next page is fetched in a task
+        task = asyncio.ensure_future(fetch(cursor))
+        try:
+            while task is not None:
+                items, cursor = await task
+                task = asyncio.ensure_future(fetch(cursor)) if cursor is not None else None
+                for item in items:
+                    yield item
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def _tasks_page(self, path: str, params: dict, page: int):
+        data = (await self._request("GET", path, params={**params, "page": page})).json()
+        tasks = data["tasks"]
+
+        if not tasks or data.get("last_page", len(tasks) < 100):
+            return tasks, None
+        return tasks, page + 1
+
+    def iter_list_tasks(self, list_id: int, **filters):
+        """Async generator version of ClickUp.iter_list_tasks"""
+        path = f"/list/{str(list_id)}/task"
+        params = ClickUp._query_params(filters)
+        return self._iter_pages(lambda page: self._tasks_page(path, params, page), 0)
+
+    def iter_workspace_tasks(self, workspace_id: int, **filters):
+        """Async generator version of ClickUp.iter_workspace_tasks"""
+        path = f"/team/{str(workspace_id)}/task"
+        params = ClickUp._query_params(filters)
+        return self._iter_pages(lambda page: self._tasks_page(path, params, page), 0)
+
+    def iter_task_comments(self, task_id: str):
+        """Async generator version of ClickUp.iter_task_comments"""
+        path = f"/task/{str(task_id)}/comment"
+
+        async def fetch(cursor):
+            comments = (await self._request("GET", path, params=cursor)).json()["comments"]
+            return comments, ClickUp._comments_cursor(comments)
+
+        return self._iter_pages(fetch, {})
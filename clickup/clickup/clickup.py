@@ -7,9 +7,17 @@ The API is documented here: https://clickup.com/api
 """
 
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import requests
+from httpsession.httpsession import get_session
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from clickup import hierarchy
+from clickup.ratelimit import RateLimiter, get_rate_limiter
+from clickup.response_cache import ResponseCache
 
 
 class ClickUp:
@@ -44,7 +52,16 @@ class ClickUp:
         "keyResultDeleted",
     ]
 
-    def __init__(self, _api_key, _api_url=None) -> None:
+    def __init__(
+        self,
+        _api_key,
+        _api_url=None,
+        session: requests.Session = None,
+        hierarchy_cache: hierarchy.HierarchyCache = None,
+        rate_limiter: RateLimiter = None,
+        response_cache: ResponseCache = None,
+        instrumentation: Instrumentation = None,
+    ) -> None:
         if _api_url:
             self.API_URL = _api_url
         else:
@@ -57,73 +74,256 @@ class ClickUp:
 
         self.API_KEY = _api_key
 
-    API_KEY = ""
+        # pooled keep-alive session shared with other clients unless one is given
+        self.session = session if session is not None else get_session()
 
-    def create_folder(self, space_id: str, name: str) -> dict:
-        resp = requests.post(
-            url=f"{self.API_URL}/space/{str(space_id)}/folder",
-            json={"name": name},
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-        )
+        # optional name index for workspace/space/folder/list lookups
+        self.hierarchy_cache = hierarchy_cache
 
-        data = resp.json()
+        # paces requests under the token's rate limit, shared by clients using the same key
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter(_api_key)
+
+        # optional cache of parsed GET responses
+        self.response_cache = response_cache
 
-        if resp.status_code != 200:
+        # timing and payload sizes of every request, off unless given
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
+    API_KEY = ""
+
+    def _request(self, method: str, path: str, extra_headers: dict = None, **kwargs) -> requests.Response:
+        headers = {"Authorization": self.API_KEY}
+        if "json" in kwargs:
+            headers["Content-Type"] = "application/json"
+        if extra_headers:
+            headers.update(extra_headers)
+
+        with self.instrumentation.span(f"clickup.{method.lower()}") as span:
+            attempt = 0
+            while True:
+                self.rate_limiter.acquire()
+                resp = self.session.request(
+                    method, url=f"{self.API_URL}{path}", headers=headers, **kwargs
+                )
+                self.rate_limiter.update(resp.headers)
+
+                if not self.rate_limiter.should_retry(method, resp.status_code, attempt):
+                    break
+
+                time.sleep(self.rate_limiter.backoff(attempt))
+                attempt += 1
+
+            span.set("attempts", attempt + 1)
+            span.sent(len(resp.request.body or b""))
+            span.received(len(resp.content))
+            if resp.status_code != 200 and resp.status_code != 304:
+                span.fail(f"HTTP {resp.status_code}")
+
+        # 304 only comes back for conditional requests made by _get_json
+        if resp.status_code != 200 and resp.status_code != 304:
             raise ValueError(
-                f"Server responded with error code {resp.status_code} {data}"
+                f"Server responded with error code {resp.status_code} {resp.content}"
             )
 
+        return resp
+
+    def _get_json(self, endpoint: str, path: str, refresh: bool = False, params: dict = None):
+        """GET path and return the parsed body, through the response cache when there is one
+
+        Args:
+            refresh bool: revalidate a fresh cached response with the server instead of using it
+            params dict: query parameters
+        """
+        cache = self.response_cache
+        if cache is None or not cache.enabled(endpoint):
+            return self._request("GET", path, params=params).json()
+
+        key = cache.key(path, params)
+        cached = cache.lookup(key)
+        if cached is not None:
+            fresh, etag, data = cached
+            if fresh and not refresh:
+                return data
+
+            if etag:
+                resp = self._request("GET", path, extra_headers={"If-None-Match": etag}, params=params)
+                if resp.status_code == 304:
+                    cache.not_modified(key, endpoint, data, etag)
+                    return data
+                data = resp.json()
+                cache.put(key, endpoint, data, resp.headers.get("ETag"))
+                return data
+
+        resp = self._request("GET", path, params=params)
+        data = resp.json()
+        cache.put(key, endpoint, data, resp.headers.get("ETag"))
         return data
 
-    # folder/{folder_id}/list
+    def _find_by_name(self, level: str, parent_id, name: str, fetch):
+        """fetch(refresh) returns the listing, refresh=True makes it skip fresh response cache entries"""
+        if self.hierarchy_cache is not None:
+            item = self.hierarchy_cache.find(level, parent_id, name, lambda: fetch(False))
+            if item is None and self.response_cache is not None:
+                # the listing may have come from the response cache, ask the server before giving up
+                item = self.hierarchy_cache.find(level, parent_id, name, lambda: fetch(True))
+            return item
+
+        for refresh in [False, True] if self.response_cache is not None else [False]:
+            for item in fetch(refresh):
+                if item["name"] == name:
+                    return item
+        return None
+
+    @staticmethod
+    def _query_params(filters: dict) -> dict:
+        # ClickUp expects array filters as statuses[]=a&statuses[]=b and lowercase booleans
+        params = {}
+        for key, value in filters.items():
+            if isinstance(value, bool):
+                value = str(value).lower()
+            if isinstance(value, (list, tuple)) and not key.endswith("[]"):
+                key = f"{key}[]"
+            params[key] = value
+        return params
+
+    def _iter_pages(self, fetch, cursor):
+        """Yields items of every page, fetching the next page while the caller handles the current one
+
+        Args:
+            fetch: callable taking a cursor and returning (items, next cursor or None on the last page)
+            cursor: cursor of the first page
+        """
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = pool.submit(fetch, cursor)
+            while future is not None:
+                items, cursor = future.result()
+                future = pool.submit(fetch, cursor) if cursor is not None else None
+                yield from items
+        finally:
+            # stopping early drops the prefetched page
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _tasks_page(self, path: str, params: dict, page: int):
+        data = self._request("GET", path, params={**params, "page": page}).json()
+        tasks = data["tasks"]
+
+        # pages hold 100 tasks, older responses don't have last_page
+        if not tasks or data.get("last_page", len(tasks) < 100):
+            return tasks, None
+        return tasks, page + 1
+
+    @staticmethod
+    def _comments_cursor(comments: list):
+        # pages hold the 25 newest comments before the cursor
+        if len(comments) < 25:
+            return None
+        return {"start": comments[-1]["date"], "start_id": comments[-1]["id"]}
+
+    @staticmethod
+    def _webhook_payload(
+        endpoint: str,
+        events: list[str],
+        space_id: int = None,
+        folder_id: int = None,
+        list_id: int = None,
+        task_id: str = None,
+    ) -> dict:
+        if not space_id and not folder_id and not list_id and not task_id:
+            raise ValueError("No id was provided for object that webhook listens to")
 
-    def create_list(self, folder_id: str, name: str) -> dict:
-        resp = requests.post(
-            url=f"{self.API_URL}/folder/{str(folder_id)}/list",
-            json={"name": name},
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-        )
+        for event in events:
+            if not event in ClickUp.WEBHOOK_EVENTS:
+                raise ValueError(f"Provided event {event} is not valid webhook event")
 
-        data = resp.json()
+        req_data = {"endpoint": endpoint, "events": events}
 
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {data}"
-            )
+        if space_id:
+            req_data["space_id"] = space_id
 
-        return data
+        if folder_id:
+            req_data["folder_id"] = folder_id
 
-    def get_workspaces(self) -> dict:
-        resp = requests.get(
-            url=f"{self.API_URL}/team/", headers={"Authorization": self.API_KEY}
-        )
+        if list_id:
+            req_data["list_id"] = list_id
 
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.json()}"
-            )
+        if task_id:
+            req_data["task_id"] = task_id
 
-        data = resp.json()
+        return req_data
 
-        return data
+    @staticmethod
+    def _task_payload(
+        name: str,
+        description: str = None,
+        assignees: list[int] = None,
+        status: str = None,
+        priority: int = None,
+        due_date: datetime = None,
+        parent: str = None,
+        tags: list[str] = None,
+        custom_fields: dict = None,
+    ) -> dict:
+        req_data = {"name": name}
 
-    # return workspace (in the url refered to as "team") attributes, else raise error
+        if description != None:
+            req_data["description"] = description
 
-    def get_workspace_by_name(self, name: str) -> dict:
-        resp = requests.get(
-            url=f"{self.API_URL}/team/", headers={"Authorization": self.API_KEY}
-        )
+        # assignees
+        if assignees != None:
+            req_data["assignees"] = assignees  # type: ignore
 
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.json()}"
-            )
+        if status != None:
+            req_data["status"] = status
 
-        data = resp.json()
+        if priority != None:
+            req_data["priority"] = priority  # type: ignore
+
+        # duedate must be provided in milliseconds
+        if due_date != None:
+            if type(due_date) == datetime:
+                req_data["due_date"] = int(due_date.timestamp() * 1000)  # type: ignore
+            elif type(due_date) == int:
+                req_data["due_date"] = due_date  # type: ignore
+
+        if parent != None:
+            req_data["parent"] = parent
 
-        for team in data["teams"]:
-            if team["name"] == name:
-                return team
+        if tags != None:
+            req_data["tags"] = tags  # type: ignore
+
+        # field id -> value, set in the same request instead of one request per field
+        if custom_fields != None:
+            req_data["custom_fields"] = [
+                {"id": field_id, "value": value} for field_id, value in custom_fields.items()
+            ]  # type: ignore
+
+        # notify all assignees and watchers of the task
+        req_data["notify_all"] = False
+
+        return req_data
+
+    def create_folder(self, space_id: str, name: str) -> dict:
+        resp = self._request("POST", f"/space/{str(space_id)}/folder", json={"name": name})
+        return resp.json()
+
+    # folder/{folder_id}/list
+
+    def create_list(self, folder_id: str, name: str) -> dict:
+        resp = self._request("POST", f"/folder/{str(folder_id)}/list", json={"name": name})
+        return resp.json()
+
+    def get_workspaces(self, refresh: bool = False) -> dict:
+        return self._get_json("workspaces", "/team/", refresh=refresh)
+
+    # return workspace (in the url refered to as "team") attributes, else raise error
+
+    def get_workspace_by_name(self, name: str) -> dict:
+        team = self._find_by_name(
+            hierarchy.WORKSPACES, None, name, lambda refresh: self.get_workspaces(refresh)["teams"]
+        )
+        if team is not None:
+            return team
 
         raise NameError(f"Workspace with name {name} was not found")
 
@@ -132,28 +332,21 @@ class ClickUp:
         workspace = self.get_workspace_by_name(name=workspace_name)
         return workspace["members"]
 
-    def get_workspace_spaces(self, workspace_id: int) -> dict:
-        resp = requests.get(
-            url=f"{self.API_URL}/team/{str(workspace_id)}/space",
-            data={"archived": "false"},
-            headers={"Authorization": self.API_KEY},
+    def get_workspace_spaces(self, workspace_id: int, refresh: bool = False) -> dict:
+        data = self._get_json(
+            "spaces", f"/team/{str(workspace_id)}/space", refresh=refresh, params={"archived": "false"}
         )
-
-        data = resp.json()
-
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {data}"
-            )
-
         return data["spaces"]
 
     def get_space_by_name(self, workspace_id: int, name: str) -> dict:
-        spaces = self.get_workspace_spaces(workspace_id=workspace_id)
-
-        for space in spaces:
-            if space["name"] == name:
-                return space
+        space = self._find_by_name(
+            hierarchy.SPACES,
+            workspace_id,
+            name,
+            lambda refresh: self.get_workspace_spaces(workspace_id=workspace_id, refresh=refresh),
+        )
+        if space is not None:
+            return space
 
         raise NameError(
             f"No space with name {name} was located in workspace with id {workspace_id}"
@@ -162,60 +355,52 @@ class ClickUp:
     def get_workspace_id_by_name(self, name: str) -> int:
         return self.get_workspace_by_name(name)["id"]
 
-    def get_space_folders(self, space_id: int) -> list:
-        resp = requests.get(
-            url=f"{self.API_URL}/space/{str(space_id)}/folder",
-            data={"archived": "false"},
-            headers={"Authorization": self.API_KEY},
+    def get_space_folders(self, space_id: int, refresh: bool = False) -> list:
+        data = self._get_json(
+            "folders", f"/space/{str(space_id)}/folder", refresh=refresh, params={"archived": "false"}
         )
-
-        data = resp.json()
-
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {data}"
-            )
-
         return data["folders"]
 
     def get_space_folder_by_name(self, space_id: int, name: str) -> dict:
-        folders = self.get_space_folders(space_id)
-
-        for folder in folders:
-            if folder["name"] == name:
-                return folder
+        folder = self._find_by_name(
+            hierarchy.FOLDERS, space_id, name, lambda refresh: self.get_space_folders(space_id, refresh)
+        )
+        if folder is not None:
+            return folder
 
         raise NameError(
             f"No folder with name {name} was found in space with id {space_id}"
         )
 
-    def get_folder_lists(self, folder_id: int) -> list:
-        resp = requests.get(
-            url=f"{self.API_URL}/folder/{str(folder_id)}/list",
-            data={"archived": "false"},
-            headers={"Authorization": self.API_KEY},
+    def get_folder_lists(self, folder_id: int, refresh: bool = False) -> list:
+        data = self._get_json(
+            "lists", f"/folder/{str(folder_id)}/list", refresh=refresh, params={"archived": "false"}
         )
-
-        data = resp.json()
-
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {data}"
-            )
-
         return data["lists"]
 
     def get_folder_list_by_name(self, folder_id: int, name: str) -> dict:
-        lists = self.get_folder_lists(folder_id)
-
-        for list in lists:
-            if list["name"] == name:
-                return list
+        list = self._find_by_name(
+            hierarchy.LISTS, folder_id, name, lambda refresh: self.get_folder_lists(folder_id, refresh)
+        )
+        if list is not None:
+            return list
 
         raise NameError(
             f"No list with name {name} was found in a folder with id {folder_id}"
         )
 
+    def get_list_by_path(
+        self, workspace_name: str, space_name: str, folder_name: str, list_name: str
+    ) -> dict:
+        """Resolves workspace -> space -> folder -> list by names
+
+        With a hierarchy_cache this normally needs no requests at all.
+        """
+        workspace = self.get_workspace_by_name(workspace_name)
+        space = self.get_space_by_name(workspace["id"], space_name)
+        folder = self.get_space_folder_by_name(space["id"], folder_name)
+        return self.get_folder_list_by_name(folder["id"], list_name)
+
     def create_webhook(
         self,
         workspace_id: int,
@@ -226,82 +411,22 @@ class ClickUp:
         list_id: int = None,
         task_id: str = None,
     ):
-        if not space_id and not folder_id and not list_id and not task_id:
-            raise ValueError("No id was provided for object that webhook listens to")
-
-        for event in events:
-            if not event in self.WEBHOOK_EVENTS:
-                raise ValueError(f"Provided event {event} is not valid webhook event")
-
-        req_data = {"endpoint": endpoint, "events": events}
-
-        if space_id:
-            req_data["space_id"] = space_id
-
-        if folder_id:
-            req_data["folder_id"] = folder_id
-
-        if list_id:
-            req_data["list_id"] = list_id
-
-        if task_id:
-            req_data["task_id"] = task_id
-
-        resp = requests.post(
-            url=f"{self.API_URL}/team/{workspace_id}/webhook",
-            json=req_data,
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
+        req_data = self._webhook_payload(
+            endpoint, events, space_id, folder_id, list_id, task_id
         )
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
 
-        data = resp.json()
-
-        return data
+        resp = self._request("POST", f"/team/{workspace_id}/webhook", json=req_data)
+        return resp.json()
 
     def get_webhooks(self, workspace_id: str):
-        resp = requests.get(
-            url=f"{self.API_URL}/team/{workspace_id}/webhook",
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-        )
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
-
-        data = resp.json()
-
-        return data
+        return self._get_json("webhooks", f"/team/{workspace_id}/webhook")
 
     def get_task_by_id(self, task_id: str):
-        resp = requests.get(
-            url=f"{self.API_URL}/task/{task_id}",
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-        )
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
-
-        data = resp.json()
-
-        return data
+        return self._get_json("task", f"/task/{task_id}")
 
     def delete_webhook_by_id(self, webhook_id: str):
-        resp = requests.delete(
-            url=f"{self.API_URL}/webhook/{webhook_id}",
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-        )
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
-
-        data = resp.json()
-
-        return data
+        resp = self._request("DELETE", f"/webhook/{webhook_id}")
+        return resp.json()
 
     def add_comment_to_task(
         self, task_id: str, comment: str, notify_all: bool = False, assignee: int = None
@@ -311,36 +436,14 @@ class ClickUp:
         if assignee != None:
             payload["assignee"] = assignee
 
-        resp = requests.post(
-            url=f"{self.API_URL}/task/{str(task_id)}/comment",
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
-            json=payload,
-        )
-
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
-
-        # data = resp.json()
+        self._request("POST", f"/task/{str(task_id)}/comment", json=payload)
 
         return True
 
     # missing implementation for getting the custom field id, otherwise works
     def set_custom_field_value(self, task_id: str, field_id: str, value):
         # https://api.clickup.com/api/v2/task/{task_id}/field/{field_id}
-
-        #
-        req = requests.post(
-            self.API_URL + "/task/" + task_id + "/field/" + field_id,
-            headers={"Authorization": self.API_KEY, "Content-Type": "application/json"},
-            json={"value": value},
-        )
-
-        if req.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {req.status_code} {req.content}"
-            )
+        self._request("POST", f"/task/{task_id}/field/{field_id}", json={"value": value})
 
         return True
 
@@ -356,48 +459,86 @@ class ClickUp:
         due_date: datetime = None,
         parent: str = None,
         tags: list[str] = None,
+        custom_fields: dict = None,
     ) -> dict:
-        req_data = {"name": name}
-
-        if description != None:
-            req_data["description"] = description
-
-        # assignees
-        if assignees != None:
-            req_data["assignees"] = assignees  # type: ignore
-
-        if status != None:
-            req_data["status"] = status
-
-        if priority != None:
-            req_data["priority"] = priority  # type: ignore
-
-        # duedate must be provided in milliseconds
-        if due_date != None:
-            if type(due_date) == datetime:
-                req_data["due_date"] = int(due_date.timestamp() * 1000)  # type: ignore
-            elif type(due_date) == int:
-                req_data["due_date"] = due_date  # type: ignore
+        req_data = self._task_payload(
+            name, description, assignees, status, priority, due_date, parent, tags, custom_fields
+        )
 
-        if parent != None:
-            req_data["parent"] = parent
+        resp = self._request("POST", f"/list/{str(list_id)}/task", json=req_data)
+        return resp.json()
+
+    def _run_bulk(self, call, items: list, max_workers: int) -> list:
+        # rate limiting happens in _request, the pool only bounds concurrency
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(call, item) for item in items]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def create_tasks(self, list_id: int, specs: list[dict], max_workers: int = 8) -> list:
+        """Creates many tasks concurrently
+
+        Args:
+            list_id int: list to create the tasks in
+            specs list[dict]: create_task keyword arguments for each task,
+                custom_fields are sent with the task instead of separately
+            max_workers int: requests in flight at once
+
+        Returns:
+            created task dicts in the order of specs, the raised exception for tasks that failed
+        """
+        return self._run_bulk(
+            lambda spec: self.create_task(list_id, **spec), specs, max_workers
+        )
 
-        if tags != None:
-            req_data["tags"] = tags  # type: ignore
+    def set_custom_field_values(self, values: list[tuple], max_workers: int = 8) -> list:
+        """Sets many custom field values concurrently
 
-        # notify all assignees and watchers of the task
-        req_data["notify_all"] = False
+        Args:
+            values list[tuple]: (task_id, field_id, value) for each field
+            max_workers int: requests in flight at once
 
-        resp = requests.post(
-            url=f"{self.API_URL}/list/{str(list_id)}/task",
-            json=req_data,
-            headers={"Content-Type": "application/json", "Authorization": self.API_KEY},
+        Returns:
+            True for each value in order, the raised exception for values that failed
+        """
+        return self._run_bulk(
+            lambda value: self.set_custom_field_value(*value), values, max_workers
         )
 
-        if resp.status_code != 200:
-            raise ValueError(
-                f"Server responded with error code {resp.status_code} {resp.content}"
-            )
-
-        data = resp.json()
-        return data
+    def iter_list_tasks(self, list_id: int, **filters):
+        """Yields every task of a list, page by page
+
+        Args:
+            list_id int: list to read
+            filters: query parameters of GET /list/{list_id}/task, e.g. archived=False, statuses=["open"]
+        """
+        path = f"/list/{str(list_id)}/task"
+        params = self._query_params(filters)
+        return self._iter_pages(lambda page: self._tasks_page(path, params, page), 0)
+
+    def iter_workspace_tasks(self, workspace_id: int, **filters):
+        """Yields every task of a workspace matching filters, page by page
+
+        Args:
+            workspace_id int: workspace (team) to read
+            filters: query parameters of GET /team/{team_id}/task, e.g. list_ids=[...], assignees=[...], include_closed=True
+        """
+        path = f"/team/{str(workspace_id)}/task"
+        params = self._query_params(filters)
+        return self._iter_pages(lambda page: self._tasks_page(path, params, page), 0)
+
+    def iter_task_comments(self, task_id: str):
+        """Yields the comments of a task from newest to oldest, page by page"""
+        path = f"/task/{str(task_id)}/comment"
+
+        def fetch(cursor):
+            comments = self._request("GET", path, params=cursor).json()["comments"]
+            return comments, self._comments_cursor(comments)
+
+        return self._iter_pages(fetch, {})
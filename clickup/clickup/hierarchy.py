@@ -0,0 +1,129 @@
+"""
+Cache of the ClickUp workspace -> space -> folder -> list hierarchy.
+
+Each listing (the spaces of a workspace, the folders of a space, ...) is kept
+as a name -> object index for ttl seconds, so name lookups don't refetch and
+rescan the listing every time. A listing is refetched lazily when it has
+expired, or once when a name is not found in it, in case the object was just
+created.
+
+Pass a HierarchyCache to ClickUp and feed webhook payloads to
+handle_webhook_event to drop listings as soon as they change.
+"""
+
+import threading
+from time import monotonic
+
+
+WORKSPACES = "workspaces"
+SPACES = "spaces"
+FOLDERS = "folders"
+LISTS = "lists"
+
+# level that a webhook event's object lives on
+EVENT_LEVELS = {
+    "list": (LISTS, "list_id"),
+    "folder": (FOLDERS, "folder_id"),
+    "space": (SPACES, "space_id"),
+}
+
+# level holding the children of objects on a level
+CHILD_LEVELS = {
+    WORKSPACES: SPACES,
+    SPACES: FOLDERS,
+    FOLDERS: LISTS,
+}
+
+
+class HierarchyCache:
+    def __init__(self, ttl: float = 300) -> None:
+        """
+        Args:
+            ttl float: seconds a listing is used before it is fetched again
+        """
+        self.ttl = ttl
+
+        # (level, parent id) -> (expires_at, {name: object})
+        self.indexes = {}
+        # (level, object id) -> parent id, to find the listing an object is in
+        self.parents = {}
+        self.lock = threading.Lock()
+
+    def find(self, level: str, parent_id, name: str, fetch):
+        """Returns the object called name in the listing, None if there is none
+
+        Args:
+            level str: one of WORKSPACES, SPACES, FOLDERS, LISTS
+            parent_id: id of the object the listing belongs to, None for workspaces
+            fetch: callable returning the listing from the api
+        """
+        key = (level, str(parent_id))
+
+        with self.lock:
+            entry = self.indexes.get(key)
+        stale = entry is None or entry[0] <= monotonic()
+
+        if stale:
+            index = self._store(level, key, fetch())
+        else:
+            index = entry[1]
+
+        item = index.get(name)
+        if item is None and not stale:
+            item = self._store(level, key, fetch()).get(name)
+
+        return item
+
+    def _store(self, level: str, key: tuple, items: list) -> dict:
+        index = {}
+        for item in items:
+            # first match wins, same as scanning the listing
+            index.setdefault(item["name"], item)
+
+        with self.lock:
+            self.indexes[key] = (monotonic() + self.ttl, index)
+            for item in items:
+                self.parents[(level, str(item["id"]))] = key[1]
+
+        return index
+
+    def invalidate(self, level: str = None, parent_id=None):
+        """Drops cached listings
+
+        Without arguments everything is dropped, with only level every listing
+        on that level, otherwise the single listing of parent_id.
+        """
+        with self.lock:
+            if level is None:
+                self.indexes.clear()
+                self.parents.clear()
+            elif parent_id is None:
+                for key in [key for key in self.indexes if key[0] == level]:
+                    del self.indexes[key]
+            else:
+                self.indexes.pop((level, str(parent_id)), None)
+
+    def handle_webhook_event(self, event: dict):
+        """Drops the listings a list/folder/space webhook event changes
+
+        Args:
+            event dict: webhook payload, with "event" and the id of the changed object
+        """
+        name = event.get("event", "")
+        for prefix, (level, id_key) in EVENT_LEVELS.items():
+            if not name.startswith(prefix):
+                continue
+
+            object_id = event.get(id_key)
+            with self.lock:
+                parent_id = self.parents.get((level, str(object_id)))
+
+            if parent_id is None:
+                # new or unknown object, its parent listing can't be told apart
+                self.invalidate(level)
+            else:
+                self.invalidate(level, parent_id)
+
+            if name.endswith("Deleted") and level in CHILD_LEVELS:
+                self.invalidate(CHILD_LEVELS[level], object_id)
+            return
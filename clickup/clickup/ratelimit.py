@@ -0,0 +1,167 @@
+"""
+Token bucket pacing for ClickUp requests.
+
+ClickUp limits requests per api token per minute and reports the state of the
+limit in X-RateLimit-Limit, X-RateLimit-Remaining and X-RateLimit-Reset
+headers. RateLimiter spaces requests out to stay under the limit, learns the
+real limit from the headers, and waits for the reset once the server says
+nothing is left.
+
+Every caller reserves a slot and is told how long to wait for it, so the lock
+is only held for a few arithmetic operations and the same limiter works for
+threads (acquire) and asyncio tasks (acquire_async).
+
+Clients using the same api token share one limiter through get_rate_limiter.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from time import monotonic
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limit: int = 100,
+        period: float = 60,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+    ) -> None:
+        """
+        Args:
+            limit int: requests allowed per period until the headers say otherwise
+            period float: seconds the limit is counted over
+            max_retries int: retries for 429 and 5xx responses
+            backoff_base float: seconds the first retry waits at most
+            backoff_max float: upper limit for a single retry wait
+        """
+        self.period = period
+        self.capacity = limit
+        self.rate = limit / period
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # tokens go negative when requests are reserved ahead of time,
+        # updated is in the future while waiting for a reset
+        self.tokens = float(limit)
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+        self.waiting = 0
+        self.requests = 0
+        self.delayed = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Takes a slot and returns the seconds to wait before using it"""
+        with self.lock:
+            now = monotonic()
+            self._refill(now)
+            self.tokens -= 1
+
+            delay = max(0.0, self.updated - now) + max(0.0, -self.tokens) / self.rate
+
+            self.requests += 1
+            if delay > 0:
+                self.delayed += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            self._set_waiting(1)
+            try:
+                time.sleep(delay)
+            finally:
+                self._set_waiting(-1)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            self._set_waiting(1)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._set_waiting(-1)
+
+    def _set_waiting(self, change: int):
+        with self.lock:
+            self.waiting += change
+
+    def update(self, headers):
+        """Adjusts the bucket to the X-RateLimit-* headers of a response"""
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+
+        with self.lock:
+            if limit is not None and int(limit) != self.capacity:
+                self.capacity = int(limit)
+                self.rate = self.capacity / self.period
+
+            if remaining is None:
+                return
+
+            remaining = int(remaining)
+            if remaining < self.tokens:
+                # other clients using the same token have spent some
+                self.tokens = float(remaining)
+
+            if remaining == 0 and reset is not None:
+                reset_at = monotonic() + max(0.0, float(reset) - time.time())
+                if reset_at > self.updated:
+                    self.updated = reset_at
+                    self.tokens = min(self.tokens, 0.0)
+
+    def should_retry(self, method: str, status_code: int, attempt: int) -> bool:
+        """429 is always retried, 5xx only for methods that are safe to repeat"""
+        if attempt >= self.max_retries:
+            return False
+        if status_code == 429:
+            return True
+        return status_code >= 500 and method in ("GET", "PUT", "DELETE")
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt, exponential with full jitter"""
+        with self.lock:
+            self.retries += 1
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "queue_depth": self.waiting,
+                "requests": self.requests,
+                "delayed": self.delayed,
+                "retries": self.retries,
+                "total_wait": self.total_wait,
+                "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+                "max_wait": self.max_wait,
+                "limit": self.capacity,
+            }
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str) -> RateLimiter:
+    """Returns the limiter shared by every client using api_key"""
+    with _rate_limiters_lock:
+        if api_key not in _rate_limiters:
+            _rate_limiters[api_key] = RateLimiter()
+        return _rate_limiters[api_key]
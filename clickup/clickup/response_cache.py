@@ -0,0 +1,194 @@
+"""
+Cache for parsed ClickUp GET responses.
+
+Responses are kept per endpoint for that endpoint's ttl, in memory or in a
+sqlite file on disk so the cache survives restarts and can be shared by
+processes on one machine. When a response had an ETag, an expired entry is
+revalidated with If-None-Match and a 304 reuses the stored body.
+
+Cached objects are handed out as is, so callers must not modify them.
+
+    cache = ResponseCache(ttls={"task": 10, "workspaces": 600})
+    clickup = ClickUp(api_key, response_cache=cache)
+
+Feed webhook payloads to handle_webhook_event to drop entries as soon as
+the task or hierarchy they belong to changes.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+
+# endpoints that can be cached and their default ttls in seconds
+DEFAULT_TTLS = {
+    "task": 30,
+    "webhooks": 300,
+    "workspaces": 600,
+    "spaces": 300,
+    "folders": 300,
+    "lists": 300,
+}
+
+# endpoints changed by list/folder/space webhook events
+EVENT_ENDPOINTS = {
+    "list": ["lists"],
+    "folder": ["folders", "lists"],
+    "space": ["spaces", "folders", "lists"],
+}
+
+
+class MemoryStore:
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        # key -> (endpoint, expires_at, etag, data), least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: tuple):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_endpoint(self, endpoint: str):
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[0] == endpoint]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskStore:
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, expires_at REAL, etag TEXT, data TEXT)"
+            )
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT endpoint, expires_at, etag, data FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        endpoint, expires_at, etag, data = row
+        return endpoint, expires_at, etag, json.loads(data)
+
+    def put(self, key: str, entry: tuple):
+        endpoint, expires_at, etag, data = entry
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, expires_at, etag, json.dumps(data)),
+            )
+
+    def delete(self, key: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def delete_endpoint(self, endpoint: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    def __init__(self, ttls: dict = None, path: str = None, max_entries: int = 10000) -> None:
+        """
+        Args:
+            ttls dict: endpoint -> seconds, overrides DEFAULT_TTLS, 0 disables caching of an endpoint
+            path str: sqlite file to keep the cache in, in memory when not given
+            max_entries int: entries kept by the in-memory store
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.store = DiskStore(path) if path else MemoryStore(max_entries)
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @staticmethod
+    def key(path: str, params: dict = None) -> str:
+        """path with its query string, parameters sorted so their order doesn't matter"""
+        if not params:
+            return path
+        return path + "?" + urlencode(sorted(params.items()), doseq=True)
+
+    def enabled(self, endpoint: str) -> bool:
+        return self.ttls.get(endpoint, 0) > 0
+
+    def lookup(self, key: str):
+        """Returns (fresh, etag, data) for a cached response, None if there is none"""
+        entry = self.store.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        _, expires_at, etag, data = entry
+        fresh = expires_at > time.time()
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh, etag, data
+
+    def put(self, key: str, endpoint: str, data, etag: str = None):
+        # wall clock time, so entries on disk stay valid across processes
+        expires_at = time.time() + self.ttls[endpoint]
+        self.store.put(key, (endpoint, expires_at, etag, data))
+
+    def not_modified(self, key: str, endpoint: str, data, etag: str):
+        self.revalidated += 1
+        self.put(key, endpoint, data, etag)
+
+    def invalidate_task(self, task_id: str):
+        self.store.delete(f"/task/{task_id}")
+
+    def invalidate_endpoint(self, endpoint: str):
+        self.store.delete_endpoint(endpoint)
+
+    def clear(self):
+        self.store.clear()
+
+    def handle_webhook_event(self, event: dict):
+        """Drops the cached responses a webhook event makes stale"""
+        if event.get("task_id"):
+            self.invalidate_task(event["task_id"])
+
+        name = event.get("event", "")
+        for prefix, endpoints in EVENT_ENDPOINTS.items():
+            if name.startswith(prefix):
+                for endpoint in endpoints:
+                    self.invalidate_endpoint(endpoint)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
@@ -0,0 +1,205 @@
+"""
+Receiver for ClickUp webhook events.
+
+WebhookReceiver is a plain ASGI app, so it runs on any ASGI server (uvicorn,
+hypercorn, ...) or can be mounted in an existing ASGI framework:
+
+    receiver = WebhookReceiver(secret=webhook["webhook"]["secret"])
+
+    @receiver.on("taskCreated")
+    async def task_created(event):
+        ...
+
+    # uvicorn module:receiver
+
+A request is acknowledged as soon as its signature is checked and the event is
+queued, handlers run afterwards on a fixed number of worker tasks. Events
+that ClickUp delivers again are recognised by their id and skipped. When the
+queue is full the receiver answers 503 so ClickUp retries later instead of
+the receiver running out of memory.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+from collections import OrderedDict
+
+from clickup.clickup import ClickUp
+
+
+class WebhookReceiver:
+    def __init__(
+        self,
+        secret: str = None,
+        workers: int = 8,
+        queue_size: int = 1000,
+        dedupe_window: int = 10000,
+    ) -> None:
+        """
+        Args:
+            secret str: webhook secret returned by create_webhook, None skips signature checks
+            workers int: handlers running at once
+            queue_size int: events waiting for a worker before requests are refused
+            dedupe_window int: number of recent event ids remembered for deduplication
+        """
+        self.secret = secret.encode() if secret else None
+        self.workers = workers
+        self.queue_size = queue_size
+        self.dedupe_window = dedupe_window
+
+        # event name -> handlers, "*" handlers get every event
+        self.handlers = {}
+        self.seen = OrderedDict()
+
+        self.queue = None
+        self.worker_tasks = []
+
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    def on(self, event: str):
+        """Decorator registering a handler for event, handlers can be sync or async"""
+        if event != "*" and event not in ClickUp.WEBHOOK_EVENTS:
+            raise ValueError(f"Provided event {event} is not valid webhook event")
+
+        def register(handler):
+            self.handlers.setdefault(event, []).append(handler)
+            return handler
+
+        return register
+
+    def verify(self, body: bytes, signature: str) -> bool:
+        if self.secret is None:
+            return True
+        if not signature:
+            return False
+        expected = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    @staticmethod
+    def event_id(event: dict, body: bytes) -> str:
+        # every change has its own history item id, redeliveries repeat them
+        history = event.get("history_items") or []
+        if history:
+            return f"{event.get('webhook_id')}:" + ",".join(str(item.get("id")) for item in history)
+        return hashlib.sha256(body).hexdigest()
+
+    def _is_duplicate(self, event_id: str) -> bool:
+        if event_id in self.seen:
+            self.seen.move_to_end(event_id)
+            return True
+
+        self.seen[event_id] = None
+        if len(self.seen) > self.dedupe_window:
+            self.seen.popitem(last=False)
+        return False
+
+    async def start(self):
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Waits for queued events to be handled and stops the workers"""
+        if self.queue is None:
+            return
+        await self.queue.join()
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.queue = None
+        self.worker_tasks = []
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await self.queue.get()
+            try:
+                handlers = self.handlers.get(event.get("event"), []) + self.handlers.get("*", [])
+                for handler in handlers:
+                    if asyncio.iscoroutinefunction(handler):
+                        await handler(event)
+                    else:
+                        await loop.run_in_executor(None, handler, event)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+            finally:
+                self.queue.task_done()
+
+    async def handle(self, body: bytes, signature: str) -> int:
+        """Checks and queues one delivery, returns the status code to answer with"""
+        await self.start()
+        self.received += 1
+
+        if not self.verify(body, signature):
+            self.rejected += 1
+            return 401
+
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self.rejected += 1
+            return 400
+
+        event_id = self.event_id(event, body)
+        if self._is_duplicate(event_id):
+            self.duplicates += 1
+            return 200
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # forget the id so the retried delivery isn't taken for a duplicate
+            self.seen.pop(event_id, None)
+            self.rejected += 1
+            return 503
+
+        return 200
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await self.start()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await self.stop()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] != "POST":
+            status = 405
+        else:
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+            headers = dict(scope["headers"])
+            signature = headers.get(b"x-signature", b"").decode()
+            status = await self.handle(body, signature)
+
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+        }
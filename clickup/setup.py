@@ -12,5 +12,6 @@ setuptools.setup(
     },
     license='MIT',
     packages=['clickup'],
-    install_requires=['requests', 'datetime'],
+    install_requires=['requests', 'datetime', 'httpsession @ git+https://github.com/pyryhelin/toolbox#subdirectory=httpsession', 'instrumentation @ git+https://github.com/pyryhelin/toolbox#subdirectory=instrumentation'],
+    extras_require={'async': ['httpx']},
 )
\ No newline at end of file
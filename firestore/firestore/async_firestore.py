@@ -0,0 +1,255 @@
+"""
+Asyncio version of the Firestore wrapper.
+
+AsyncFirestore, AsyncCollection and AsyncQuery have the same methods as
+Firestore, Collection and Query, as coroutines on Firestore's AsyncClient, so
+reads don't block the event loop and many lookups can be gathered at once:
+
+    db = AsyncFirestore("credentials.json")
+    users = db.get_collection_ref("users")
+
+    first, second = await asyncio.gather(users.get_document_by_id("a"), users.get_document_by_id("b"))
+
+    async for document_id, user in users.iter_documents():
+        ...
+
+Bulk writes use Firestore's BulkWriter, which only runs on its own threads,
+so they are run in a worker thread and awaited. Every collection of an
+AsyncFirestore shares one synchronous client for them, an AsyncCollection
+made on its own copies its client once, on its first bulk write.
+"""
+
+import asyncio
+import dataclasses
+
+import firebase_admin
+from firebase_admin import credentials, firestore, firestore_async
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from firestore.firestore import MISSING, OPERATION, Collection, Query
+from firestore.results import QueryResults
+
+
+class AsyncQuery(Query):
+    """Query with the same builder methods, results are fetched with coroutines"""
+
+    async def _aggregate(self, aggregation, name: str):
+        with self.instrumentation.span(f"firestore.{name}", collection=self.collection_ref.id):
+            return (await aggregation.get())[0][0].value
+
+    async def count(self) -> int:
+        return await self._aggregate(self._build_limited().count(alias="count"), "count")
+
+    async def sum(self, field: str):
+        return await self._aggregate(self._build_limited().sum(field, alias="sum"), "sum")
+
+    async def avg(self, field: str):
+        return await self._aggregate(self._build_limited().avg(field, alias="avg"), "avg")
+
+    async def execute(self, model=None) -> QueryResults:
+        fields = [field.name for field in dataclasses.fields(model)] if model is not None else None
+        data = await self._run(self._build_limited(fields))
+
+        if model is not None:
+            return data.to_models(model)
+        return data
+
+    async def columns(self, fields: list) -> dict:
+        return (await self._run(self._build_limited(list(fields)))).to_columns(fields)
+
+    async def _run(self, query) -> QueryResults:
+        with self.instrumentation.span("firestore.query", collection=self.collection_ref.id) as span:
+            data = QueryResults([doc async for doc in query.stream()])
+            span.set("documents", len(data))
+        return data
+
+    async def stream(self, page_size: int = 500, start_after: str = None):
+        """Async iterator over matching document snapshots, see Query.stream"""
+        query = self._build()
+        remaining = self.limit_val
+
+        cursor = None
+        if start_after:
+            cursor = await self.collection_ref.document(start_after).get()
+            if not cursor.exists:
+                raise Exception(f"Document {start_after} to resume after was not found")
+
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+
+            page = query.limit(size)
+            if cursor is not None:
+                page = page.start_after(cursor)
+
+            with self.instrumentation.span("firestore.query_page", collection=self.collection_ref.id) as span:
+                docs = [doc async for doc in page.stream()]
+                span.set("documents", len(docs))
+
+            for doc in docs:
+                cursor = doc
+                self.resume_token = doc.id
+                yield doc
+
+            if remaining is not None:
+                remaining -= len(docs)
+
+            if len(docs) < size:
+                return
+
+
+class AsyncCollection:
+    def __init__(
+        self,
+        db: firestore.AsyncClient,
+        collection_name: str = "",
+        collection_ref: firestore.AsyncCollectionReference = None,
+        instrumentation: Instrumentation = None,
+        max_concurrency: int = 20,
+        sync_db: firestore.firestore.Client = None,
+    ):
+        """
+        Args:
+            max_concurrency int: get_all requests in flight at once in get_documents_by_ids
+            sync_db Client: synchronous client for bulk writes, a copy of db's client is made when not given
+        """
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+        self.max_concurrency = max_concurrency
+        self.sync_db = sync_db
+        self.sync_collection = None
+
+        if collection_ref:
+            self.collection_ref = collection_ref
+        elif collection_name:
+            self.collection_ref = db.collection(collection_name)
+        else:
+            raise Exception("No collection name or reference given")
+
+    async def get_document_by_id(self, document_id: str) -> dict:
+        try:
+            with self.instrumentation.span("firestore.get", collection=self.collection_ref.id):
+                data = await self.collection_ref.document(document_id).get()
+        except Exception:
+            return None
+        return data.to_dict()
+
+    async def get_documents_by_ids(self, ids: list[str], fields: list[str] = None, chunk_size: int = 100) -> dict:
+        """Fetches many documents with batched get_all requests gathered concurrently, see Collection.get_documents_by_ids"""
+        ids = list(dict.fromkeys(ids))
+        client = self.collection_ref._client
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(chunk: list) -> list:
+            references = [self.collection_ref.document(document_id) for document_id in chunk]
+            async with semaphore:
+                with self.instrumentation.span("firestore.get_all", collection=self.collection_ref.id) as span:
+                    snapshots = [snapshot async for snapshot in client.get_all(references, field_paths=fields)]
+                    span.set("documents", len(snapshots))
+            return snapshots
+
+        pages = await asyncio.gather(*[fetch(ids[i:i + chunk_size]) for i in range(0, len(ids), chunk_size)])
+
+        found = {}
+        for snapshots in pages:
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    found[snapshot.id] = snapshot.to_dict()
+
+        return {document_id: found.get(document_id, MISSING) for document_id in ids}
+
+    async def get_documents(self) -> dict:
+        return {doc.id: doc.to_dict() async for doc in self.collection_ref.stream()}
+
+    async def get_documents_by_filter(self, field: str, operations: OPERATION, value) -> dict:
+        query = self.collection_ref.where(filter=firestore.FieldFilter(field_path=field, op_string=operations.value, value=value))
+        return {doc.id: doc.to_dict() async for doc in query.stream()}
+
+    async def iter_documents(self, page_size: int = 500, start_after: str = None):
+        """Async iterator of (id, dict) for every document in constant memory, see Query.stream"""
+        async for doc in self.query().stream(page_size=page_size, start_after=start_after):
+            yield doc.id, doc.to_dict()
+
+    async def iter_documents_by_filter(self, field: str, operations: OPERATION, value, page_size: int = 500, start_after: str = None):
+        query = self.query().filter(field, operations, value)
+        async for doc in query.stream(page_size=page_size, start_after=start_after):
+            yield doc.id, doc.to_dict()
+
+    async def add_document(self, document_id: str, document: dict):
+        return await self.collection_ref.document(document_id).set(document)
+
+    async def delete_document(self, document_id: str):
+        return await self.collection_ref.document(document_id).delete()
+
+    def _sync_collection(self) -> Collection:
+        # BulkWriter works on a synchronous client, made once and reused for every bulk write
+        if self.sync_collection is None:
+            if self.sync_db is None:
+                self.sync_db = self.collection_ref._client._to_sync_copy()
+            self.sync_collection = Collection(
+                self.sync_db,
+                collection_ref=self.sync_db.collection(*self.collection_ref._path),
+                instrumentation=self.instrumentation,
+            )
+        return self.sync_collection
+
+    async def add_documents(self, documents: dict[str, dict], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        """Sets many documents, see Collection._bulk_write for arguments and results"""
+        return await asyncio.to_thread(self._sync_collection().add_documents, documents, max_attempts, ops_per_second)
+
+    async def update_documents(self, updates: dict[str, dict], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        return await asyncio.to_thread(self._sync_collection().update_documents, updates, max_attempts, ops_per_second)
+
+    async def delete_documents(self, document_ids: list[str], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        return await asyncio.to_thread(self._sync_collection().delete_documents, document_ids, max_attempts, ops_per_second)
+
+    def query(self) -> AsyncQuery:
+        return AsyncQuery(self.collection_ref, self.instrumentation)
+
+
+class AsyncFirestore:
+    def __init__(self, cred_path: str, instrumentation: Instrumentation = None, max_concurrency: int = 20):
+        # the default app may already be set up by a synchronous Firestore in the same process
+        try:
+            self.app = firebase_admin.get_app()
+        except ValueError:
+            self.app = firebase_admin.initialize_app(credentials.Certificate(cred_path))
+
+        self.db: firestore.AsyncClient = firestore_async.client(self.app)
+        # shared by the bulk writes of every collection
+        self.sync_db: firestore.firestore.Client = firestore.client(self.app)
+        self.collections = {}
+        self.instrumentation = instrumentation
+        self.max_concurrency = max_concurrency
+
+    def _collection(self, collection_name: str = "", collection_ref=None) -> AsyncCollection:
+        return AsyncCollection(
+            self.db,
+            collection_name,
+            collection_ref=collection_ref,
+            instrumentation=self.instrumentation,
+            max_concurrency=self.max_concurrency,
+            sync_db=self.sync_db,
+        )
+
+    def get_collection_ref(self, collection_name: str) -> AsyncCollection:
+        """Returns the collection, creating and caching the reference on first access"""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            collection = self.collections.setdefault(collection_name, self._collection(collection_name))
+        return collection
+
+    def add_collection(self, collection_name: str) -> AsyncCollection:
+        if collection_name in self.collections:
+            raise Exception(f"Collection named {collection_name} already exists")
+        self.collections[collection_name] = self._collection(collection_name)
+        return self.collections[collection_name]
+
+    async def get_collections(self) -> dict:
+        """Lists every top level collection from the server and caches the references"""
+        async for collection in self.db.collections():
+            if collection.id not in self.collections:
+                self.collections[collection.id] = self._collection(collection_ref=collection)
+
+        return self.collections
+
+    def close(self):
+        self.db.close()
@@ -1,6 +1,14 @@
 import firebase_admin
 from firebase_admin import firestore, credentials
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
+from google.rpc import code_pb2
+from instrumentation.instrumentation import DISABLED, Instrumentation
 
+from firestore.mirror import CollectionMirror
+from firestore.results import QueryResults
+
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import TypedDict
 
@@ -10,6 +18,30 @@ class FirestoreDocument(TypedDict):
     id: firestore.firestore.DocumentSnapshot
 
 
+# write failures worth retrying, others (NOT_FOUND, INVALID_ARGUMENT, PERMISSION_DENIED, ...) fail the same way again
+RETRYABLE_CODES = frozenset([
+    code_pb2.ABORTED,
+    code_pb2.UNAVAILABLE,
+    code_pb2.RESOURCE_EXHAUSTED,
+    code_pb2.DEADLINE_EXCEEDED,
+    code_pb2.INTERNAL,
+])
+
+# value in get_documents_by_ids results for documents that don't exist
+MISSING = object()
+
+
+class BulkWriteError(Exception):
+    """Result of a bulk write that failed after all of its attempts"""
+
+    def __init__(self, document_id: str, code: int, message: str, attempts: int):
+        self.document_id = document_id
+        self.code = code
+        self.message = message
+        self.attempts = attempts
+        super().__init__(f"Writing document {document_id} failed after {attempts} attempts with code {code}: {message}")
+
+
 class OPERATION(Enum):
     EQUAL = "=="
     LESS_THAN = "<"
@@ -27,15 +59,37 @@ class ORDER_BY_DIRECTION(Enum):
     DESCENDING = firestore.firestore.Query.DESCENDING
 
 class Query:
-    def __init__(self, collection_ref: firestore.firestore.CollectionReference):
+    def __init__(self, collection_ref: firestore.firestore.CollectionReference, instrumentation: Instrumentation = DISABLED):
         self.collection_ref = collection_ref
+        self.instrumentation = instrumentation
         self.order_by_direction = ORDER_BY_DIRECTION.DESCENDING
+        # all filters must match
+        self.filters = []
+        # (field, direction) in the order they were added
+        self.orders = []
+        # fields to return, empty returns whole documents
+        self.fields = []
+        self.limit_val = None
+        # id of the last document stream yielded, None until it yields one
+        self.resume_token = None
         
     
     def filter(self, field: str, operations: OPERATION, value):
-        self.field = field
-        self.operations = operations
-        self.value = value
+        """Adds a filter, documents must match every filter added"""
+        self.filters.append(firestore.firestore.FieldFilter(field_path=field, op_string=operations.value, value=value))
+        return self
+
+    def or_filter(self, *conditions: tuple[str, OPERATION, object]):
+        """Adds a filter matching documents that match any of the (field, operation, value) conditions"""
+        self.filters.append(firestore.firestore.Or(filters=[
+            firestore.firestore.FieldFilter(field_path=field, op_string=operations.value, value=value)
+            for field, operations, value in conditions
+        ]))
+        return self
+
+    def select(self, *fields: str):
+        """Only return the given fields of each document"""
+        self.fields.extend(fields)
         return self
 
     def limit(self, limit: int):
@@ -43,31 +97,125 @@ class Query:
         return self
 
     def order_by(self, field: str, direction: ORDER_BY_DIRECTION=None):
-        self.order_by_field = field
-        if direction:
-            self.order_by_direction = direction
+        self.orders.append((field, direction or self.order_by_direction))
         return self
 
-    def execute(self) -> FirestoreDocument:
+    def _build(self, fields: list = None) -> firestore.firestore.Query:
+        """Builds the query, fields is the projection to use when select wasn't called"""
         query = self.collection_ref._query()
         
-        if hasattr(self, "field") and hasattr(self, "operations") and hasattr(self, "value"):
-            query = query.where(filter=firestore.firestore.FieldFilter(field_path=self.field, op_string=self.operations.value, value=self.value))
+        for query_filter in self.filters:
+            query = query.where(filter=query_filter)
         
-        if hasattr(self, "limit_val"):
-            query = query.limit(self.limit_val)
+        fields = self.fields or fields
+        if fields:
+            # cursors are built from the ordered fields, so they must be in the projection
+            fields = fields + [field for field, _ in self.orders if field not in fields]
+            query = query.select(fields)
         
-        if hasattr(self, "order_by_field"):
-            query = query.order_by(self.order_by_field, direction=self.order_by_direction.value)
-        data  =  {doc.id:doc for doc in query.stream()}
-        data_list = [doc for doc in query.stream()]
-        print(data_list)
+        for field, direction in self.orders:
+            query = query.order_by(field, direction=direction.value)
+        return query
+
+    def _build_limited(self, fields: list = None) -> firestore.firestore.Query:
+        # limit goes last so it applies to the ordered results
+        query = self._build(fields)
+        if self.limit_val is not None:
+            query = query.limit(self.limit_val)
+        return query
+
+    def _aggregate(self, aggregation, name: str):
+        with self.instrumentation.span(f"firestore.{name}", collection=self.collection_ref.id):
+            return aggregation.get()[0][0].value
+
+    def count(self) -> int:
+        """Number of matching documents, counted on the server"""
+        return self._aggregate(self._build_limited().count(alias="count"), "count")
+
+    def sum(self, field: str):
+        """Sum of field over matching documents, computed on the server"""
+        return self._aggregate(self._build_limited().sum(field, alias="sum"), "sum")
+
+    def avg(self, field: str):
+        """Average of field over matching documents, computed on the server"""
+        return self._aggregate(self._build_limited().avg(field, alias="avg"), "avg")
+
+    def execute(self, model=None) -> QueryResults:
+        """Runs the query, returns {id: Document} without copying the documents, see results.py
+
+        Args:
+            model: dataclass to build from each document instead, returns {id: model},
+                only its fields are requested from the server unless select was called
+        """
+        fields = [field.name for field in dataclasses.fields(model)] if model is not None else None
+        data = self._run(self._build_limited(fields))
+
+        if model is not None:
+            return data.to_models(model)
         return data
-    
+
+    def columns(self, fields: list) -> dict:
+        """Runs the query for only the given fields, returns them column oriented, see QueryResults.to_columns"""
+        return self._run(self._build_limited(list(fields))).to_columns(fields)
+
+    def _run(self, query) -> QueryResults:
+        with self.instrumentation.span("firestore.query", collection=self.collection_ref.id) as span:
+            data = QueryResults(query.stream())
+            span.set("documents", len(data))
+        return data
+
+    def stream(self, page_size: int = 500, start_after: str = None):
+        """Yields matching document snapshots, fetching page_size documents per request
+
+        Pages are chained with a cursor on the last document, so memory use
+        stays at one page and every document is read once. After each document
+        self.resume_token holds its id, passing that as start_after continues
+        where the iteration stopped (costs one extra read to load the cursor).
+
+        Args:
+            page_size int: documents fetched per request
+            start_after str: resume token (document id) to continue after
+        """
+        query = self._build()
+        remaining = self.limit_val
+
+        cursor = None
+        if start_after:
+            cursor = self.collection_ref.document(start_after).get()
+            if not cursor.exists:
+                raise Exception(f"Document {start_after} to resume after was not found")
+
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+
+            page = query.limit(size)
+            if cursor is not None:
+                page = page.start_after(cursor)
+
+            # the span covers fetching the page, not the caller's work between documents
+            with self.instrumentation.span("firestore.query_page", collection=self.collection_ref.id) as span:
+                docs = list(page.stream())
+                span.set("documents", len(docs))
+
+            count = 0
+            for doc in docs:
+                count += 1
+                cursor = doc
+                self.resume_token = doc.id
+                yield doc
+
+            if remaining is not None:
+                remaining -= count
+
+            if count < size:
+                return
 
 
 class Collection:
-    def __init__(self, db: firestore.firestore.Client, collection_name: str="", collection_ref: firestore.firestore.CollectionReference=None):
+    def __init__(self, db: firestore.firestore.Client, collection_name: str="", collection_ref: firestore.firestore.CollectionReference=None, instrumentation: Instrumentation = None):
+        # timing of reads and writes, off unless given
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
         if collection_ref:
             self.collection_ref = collection_ref
         elif collection_name:
@@ -75,55 +223,234 @@ class Collection:
         else:
             raise Exception("No collection name or reference given")
 
+        # opt-in local copy answering reads, see start_mirror
+        self.mirror: CollectionMirror = None
+
+    def start_mirror(self, index_fields: list = (), timeout: float = 30) -> CollectionMirror:
+        """Loads the collection into memory and keeps it current with a snapshot listener
+
+        get_document_by_id, get_documents and equality get_documents_by_filter
+        are then answered from memory, see mirror.py. Only for small collections,
+        the whole collection is held in memory.
+
+        Args:
+            index_fields list: fields to index for equality filters
+            timeout float: seconds to wait for the collection to load
+        """
+        if self.mirror is None:
+            self.mirror = CollectionMirror(self.collection_ref, index_fields)
+        return self.mirror.start(timeout)
+
+    def stop_mirror(self):
+        if self.mirror is not None:
+            self.mirror.stop()
+            self.mirror = None
+
     def get_document_by_id(self, document_id: str) -> dict:
+        if self.mirror and self.mirror.ready:
+            return self.mirror.get(document_id)
+
         try: 
-            data = self.collection_ref.document(document_id).get()
+            with self.instrumentation.span("firestore.get", collection=self.collection_ref.id):
+                data = self.collection_ref.document(document_id).get()
         except Exception as e:
             return None
         return data.to_dict()
 
+    def get_documents_by_ids(self, ids: list[str], fields: list[str] = None, chunk_size: int = 100, max_workers: int = 8) -> dict:
+        """Fetches many documents with batched get_all requests, chunks are fetched concurrently
+
+        Unlike get_document_by_id errors are raised, not returned as None.
+
+        Args:
+            ids list: document ids to fetch
+            fields list: fields to return, whole documents when not given
+            chunk_size int: documents per request
+            max_workers int: requests in flight at once
+
+        Returns:
+            dict of document id to document dict, or MISSING for documents that don't exist, in input order
+        """
+        # duplicates are fetched once
+        ids = list(dict.fromkeys(ids))
+
+        if fields is None and self.mirror and self.mirror.ready:
+            documents = {document_id: self.mirror.get(document_id) for document_id in ids}
+            return {document_id: MISSING if data is None else data for document_id, data in documents.items()}
+
+        client = self.collection_ref._client
+
+        def fetch(chunk: list) -> list:
+            references = [self.collection_ref.document(document_id) for document_id in chunk]
+            with self.instrumentation.span("firestore.get_all", collection=self.collection_ref.id) as span:
+                snapshots = list(client.get_all(references, field_paths=fields))
+                span.set("documents", len(snapshots))
+            return snapshots
+
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        if len(chunks) <= 1:
+            pages = [fetch(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+                pages = list(pool.map(fetch, chunks))
+
+        found = {}
+        for snapshots in pages:
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    found[snapshot.id] = snapshot.to_dict()
+
+        return {document_id: found.get(document_id, MISSING) for document_id in ids}
+
     def get_documents(self) -> list[dict]:
+        if self.mirror and self.mirror.ready:
+            return self.mirror.get_all()
         return {doc.id:doc.to_dict() for doc in self.collection_ref.stream()}
 
     def get_documents_by_filter(self, field: str, operations: OPERATION, value) -> list[dict]:
+        # nested field paths aren't mirrored, those go to the server
+        if operations == OPERATION.EQUAL and "." not in field and self.mirror and self.mirror.ready:
+            return self.mirror.filter_equal(field, value)
         return {doc.id:doc.to_dict() for doc in self.collection_ref.where(filter=firestore.firestore.FieldFilter(field_path=field, op_string=operations.value, value=value)).stream()}
 
+    def iter_documents(self, page_size: int = 500, start_after: str = None):
+        """Yields (id, dict) for every document in constant memory, see Query.stream"""
+        for doc in self.query().stream(page_size=page_size, start_after=start_after):
+            yield doc.id, doc.to_dict()
+
+    def iter_documents_by_filter(self, field: str, operations: OPERATION, value, page_size: int = 500, start_after: str = None):
+        """Yields (id, dict) for every matching document in constant memory, see Query.stream"""
+        query = self.query().filter(field, operations, value)
+        for doc in query.stream(page_size=page_size, start_after=start_after):
+            yield doc.id, doc.to_dict()
+
     def add_document(self, document_id: str, document: dict) -> str:
         return self.collection_ref.document(document_id).set(document)
 
     def delete_document(self, document_id: str) -> str:
         return self.collection_ref.document(document_id).delete()
 
+    def add_documents(self, documents: dict[str, dict], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        """Sets many documents, see _bulk_write for arguments and results"""
+        return self._bulk_write(
+            lambda writer, ref, document: writer.set(ref, document),
+            documents.items(),
+            max_attempts,
+            ops_per_second,
+        )
+
+    def update_documents(self, updates: dict[str, dict], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        """Updates fields of many existing documents, see _bulk_write for arguments and results"""
+        return self._bulk_write(
+            lambda writer, ref, fields: writer.update(ref, fields),
+            updates.items(),
+            max_attempts,
+            ops_per_second,
+        )
+
+    def delete_documents(self, document_ids: list[str], max_attempts: int = 5, ops_per_second: int = 500) -> dict:
+        """Deletes many documents, see _bulk_write for arguments and results"""
+        return self._bulk_write(
+            lambda writer, ref, _: writer.delete(ref),
+            ((document_id, None) for document_id in document_ids),
+            max_attempts,
+            ops_per_second,
+        )
+
+    def _bulk_write(self, write, items, max_attempts: int, ops_per_second: int) -> dict:
+        """Runs write(bulk_writer, document_ref, data) for every (document_id, data) in items
+
+        Firestore's BulkWriter splits the writes into batches, sends them in
+        parallel, ramps up to ops_per_second and retries writes that failed
+        with a transient error, waiting one second longer before each retry.
+        Other errors fail the document on the first attempt.
+
+        Args:
+            max_attempts int: attempts per document before giving up on it, 5 attempts wait 10 seconds in total
+            ops_per_second int: upper limit for write throughput
+
+        Returns:
+            dict of document id to WriteResult, or BulkWriteError for documents that failed, in input order
+        """
+        writer = self.collection_ref._client.bulk_writer(
+            options=BulkWriterOptions(
+                initial_ops_per_second=min(ops_per_second, 500),
+                max_ops_per_second=ops_per_second,
+                # exponential waits attempts**2 seconds without a cap
+                retry=BulkRetry.linear,
+            )
+        )
+
+        results = {}
+
+        def on_result(reference, result, _):
+            results[reference.id] = result
+
+        def on_error(error, _) -> bool:
+            # attempts counts retries already made, this failure is attempt number attempts + 1
+            if error.code in RETRYABLE_CODES and error.attempts + 1 < max_attempts:
+                return True
+
+            document_id = error.operation.reference.id
+            results[document_id] = BulkWriteError(document_id, error.code, error.message, error.attempts + 1)
+            return False
+
+        writer.on_write_result(on_result)
+        writer.on_write_error(on_error)
+
+        with self.instrumentation.span("firestore.bulk_write", collection=self.collection_ref.id) as span:
+            document_ids = []
+            for document_id, data in items:
+                document_ids.append(document_id)
+                write(writer, self.collection_ref.document(document_id), data)
+
+            writer.close()
+
+            failed = sum(1 for result in results.values() if isinstance(result, BulkWriteError))
+            span.set("documents", len(document_ids))
+            span.set("failed", failed)
+            if failed:
+                span.fail(f"{failed} of {len(document_ids)} writes failed")
+
+        return {document_id: results.get(document_id) for document_id in document_ids}
+
     def query(self) -> Query:
-        return Query(self.collection_ref)
+        return Query(self.collection_ref, self.instrumentation)
 
 
 class Firestore:
-    def __init__(self, cred_path: str):
+    def __init__(self, cred_path: str, instrumentation: Instrumentation = None):
         cred = credentials.Certificate(cred_path)
         self.app = firebase_admin.initialize_app(cred)
         self.db: firestore.firestore.Client = firestore.client()
-        self.collctions = {}
-        self.get_collections()
+        # collections are resolved on first access, get_collections lists them all
+        self.collections = {}
+        # handed to every collection
+        self.instrumentation = instrumentation
 
     def get_collection_ref(self, collection_name: str) -> Collection:
-        if collection_name in self.collections:
-            return self.collections[collection_name]
-        else:
-            # self.add_collection(collection_name)
-            raise Exception(f"Collection named {collection_name} not found")
+        """Returns the collection, creating and caching the reference on first access
+
+        Creating a reference does not call the server, so this is free for
+        collections that were never listed.
+        """
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            collection = self.collections.setdefault(collection_name, Collection(self.db, collection_name, instrumentation=self.instrumentation))
+        return collection
     
     def add_collection(self, collection_name: str) -> Collection:
         if collection_name in self.collections:
             raise Exception(f"Collection named {collection_name} already exists")
         else:
-            self.collections[collection_name] = Collection(self.db, collection_name)
+            self.collections[collection_name] = Collection(self.db, collection_name, instrumentation=self.instrumentation)
             return self.collections[collection_name]
 
     def get_collections(self) -> list[dict[str: firestore.firestore.CollectionReference]]:
-        self.collections = {}
+        """Lists every top level collection from the server and caches the references"""
         for collection in self.db.collections():
             collection: firestore.firestore.CollectionReference = collection
-            self.collections[collection.id] = Collection(self.db, collection_ref=collection)
+            if collection.id not in self.collections:
+                self.collections[collection.id] = Collection(self.db, collection_ref=collection, instrumentation=self.instrumentation)
 
-        return self.collections
\ No newline at end of file
+        return self.collections
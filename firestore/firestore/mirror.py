@@ -0,0 +1,180 @@
+"""
+Local mirror of a Firestore collection, kept current by a snapshot listener.
+
+Meant for small, read-heavy collections (config, lookup tables) that are
+read on almost every request. The collection is loaded once and every change
+after that arrives as a delta through on_snapshot, so reads are answered
+from memory without billed reads or network latency:
+
+    collection = db.get_collection_ref("config")
+    collection.start_mirror(index_fields=["type"])
+
+    collection.get_document_by_id("feature_flags")               # from memory
+    collection.get_documents_by_filter("type", OPERATION.EQUAL, "plan")  # from the index
+
+Equality lookups on index_fields are answered from a value -> ids index,
+other fields are answered with a scan of the mirror. Both compare like the
+server does, where true is not equal to 1 although Python says it is. Reads fall back to the
+server while the first snapshot hasn't arrived or when the listener stopped.
+
+stats() tells whether the mirror can be trusted: ready is True while the
+first snapshot has arrived and the listener is running, the listener keeps
+the mirror current for as long as that holds. sync_lag is the time between
+the server's read time of the last snapshot and the mirror applying it.
+since_last_change is the time since the last snapshot was applied, which
+only says how long the collection has been quiet: the listener is not
+called when nothing changed, so it grows on an up to date mirror too.
+"""
+
+import threading
+import time
+
+from google.cloud.firestore_v1.watch import ChangeType
+
+
+def _timestamp(read_time) -> float:
+    # the listener hands out datetimes, protobuf Timestamps in older versions
+    if read_time is None:
+        return None
+    if hasattr(read_time, "timestamp"):
+        return read_time.timestamp()
+    return read_time.seconds + read_time.nanos / 1e9
+
+
+def _key(value):
+    # bool is an int subclass, True == 1 == 1.0 in Python but not in Firestore
+    return (isinstance(value, bool), value)
+
+
+class CollectionMirror:
+    def __init__(self, collection_ref, index_fields: list = ()) -> None:
+        """
+        Args:
+            collection_ref CollectionReference: collection to mirror
+            index_fields list: fields to keep an equality index for
+        """
+        self.collection_ref = collection_ref
+
+        # document id -> document dict
+        self.documents = {}
+        # field -> _key(value) -> set of document ids
+        self.indexes = {field: {} for field in index_fields}
+        self.lock = threading.Lock()
+
+        self.watch = None
+        self.synced = threading.Event()
+
+        self.snapshots = 0
+        self.changes = 0
+        self.last_applied = None
+        self.last_read_time = None
+        self.sync_lag = None
+
+    def start(self, timeout: float = 30):
+        """Starts listening and waits up to timeout seconds for the collection to load"""
+        if self.watch is None:
+            self.watch = self.collection_ref.on_snapshot(self._on_snapshot)
+        if not self.synced.wait(timeout):
+            raise Exception(f"Mirror of collection {self.collection_ref.id} did not sync in {timeout} seconds")
+        return self
+
+    def stop(self):
+        if self.watch is not None:
+            self.watch.unsubscribe()
+            self.watch = None
+        self.synced.clear()
+
+    @property
+    def ready(self) -> bool:
+        """True when the mirror is loaded and its listener is still running"""
+        return self.synced.is_set() and self.watch is not None and self.watch.is_active
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # runs on the listener's thread
+        with self.lock:
+            for change in changes:
+                document = change.document
+                self._unindex(document.id)
+                if change.type == ChangeType.REMOVED:
+                    self.documents.pop(document.id, None)
+                else:
+                    data = document.to_dict()
+                    self.documents[document.id] = data
+                    self._index(document.id, data)
+
+            self.snapshots += 1
+            self.changes += len(changes)
+            self.last_applied = time.time()
+            self.last_read_time = _timestamp(read_time)
+            if self.last_read_time is not None:
+                self.sync_lag = max(0.0, self.last_applied - self.last_read_time)
+
+        self.synced.set()
+
+    def _index(self, document_id: str, data: dict):
+        # caller holds self.lock
+        for field, index in self.indexes.items():
+            if field in data:
+                try:
+                    index.setdefault(_key(data[field]), set()).add(document_id)
+                except TypeError:
+                    # lists and maps can't be index keys, filters on them scan
+                    pass
+
+    def _unindex(self, document_id: str):
+        # caller holds self.lock
+        old = self.documents.get(document_id)
+        if old is None:
+            return
+        for field, index in self.indexes.items():
+            if field not in old:
+                continue
+            key = _key(old[field])
+            try:
+                ids = index.get(key)
+            except TypeError:
+                continue
+            if ids is not None:
+                ids.discard(document_id)
+                if not ids:
+                    del index[key]
+
+    def get(self, document_id: str) -> dict:
+        """Copy of the document, None if it does not exist"""
+        with self.lock:
+            data = self.documents.get(document_id)
+            return dict(data) if data is not None else None
+
+    def get_all(self) -> dict:
+        with self.lock:
+            return {document_id: dict(data) for document_id, data in self.documents.items()}
+
+    def filter_equal(self, field: str, value) -> dict:
+        """Documents whose field equals value, as {id: dict}"""
+        with self.lock:
+            index = self.indexes.get(field)
+            if index is not None:
+                try:
+                    ids = index.get(_key(value), ())
+                except TypeError:
+                    ids = None
+                if ids is not None:
+                    return {document_id: dict(self.documents[document_id]) for document_id in ids}
+
+            return {
+                document_id: dict(data)
+                for document_id, data in self.documents.items()
+                if field in data and _key(data[field]) == _key(value)
+            }
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "documents": len(self.documents),
+                "snapshots": self.snapshots,
+                "changes": self.changes,
+                "active": self.watch is not None and self.watch.is_active,
+                "ready": self.ready,
+                "sync_lag": self.sync_lag,
+                "since_last_change": time.time() - self.last_applied if self.last_applied is not None else None,
+            }
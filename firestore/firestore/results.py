@@ -0,0 +1,136 @@
+"""
+Query results that don't copy the documents.
+
+The client decodes every field of a snapshot when the response arrives, and
+DocumentSnapshot.to_dict() then deep copies the whole document on top of
+that. Document keeps the snapshot and hands out single fields, copying only
+that field (and only when it is a map or array), so reading a couple of
+fields of wide documents skips the deep copies:
+
+    results = collection.query().filter("plan", OPERATION.EQUAL, "pro").execute()
+    for document in results.values():
+        document["email"], document.get("address.city")
+
+The snapshots still hold whole documents. To cut what is sent, decoded and
+kept in memory, the fields have to be selected on the server, which
+execute(model=) and columns() do:
+
+    users = collection.query().execute(model=User)     # {id: User(...)}, only User's fields are fetched
+    columns = collection.query().columns(["email", "seats"])   # {"id": [...], "email": [...], "seats": [...]}
+
+QueryResults is a read-only mapping of id -> Document and Document has the
+DocumentSnapshot methods callers used before (id, get, to_dict, exists), so
+code written against the dict of snapshots execute used to return still works.
+"""
+
+import copy
+import dataclasses
+from collections.abc import Mapping
+
+# returned by Document.value for fields the document doesn't have
+_ABSENT = object()
+
+
+class Document:
+    __slots__ = ("id", "snapshot")
+
+    def __init__(self, snapshot) -> None:
+        self.id = snapshot.id
+        self.snapshot = snapshot
+
+    def value(self, field_path: str, default=_ABSENT):
+        if "." in field_path:
+            try:
+                return self.snapshot.get(field_path)
+            except KeyError:
+                if default is _ABSENT:
+                    raise
+                return default
+
+        data = self.snapshot._data
+        if field_path not in data:
+            if default is _ABSENT:
+                raise KeyError(field_path)
+            return default
+
+        value = data[field_path]
+        # maps and arrays are copied so callers can't change the snapshot
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def get(self, field_path: str):
+        """Value of a field, dotted paths reach into maps, raises KeyError like DocumentSnapshot.get"""
+        return self.value(field_path)
+
+    __getitem__ = get
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.snapshot._data
+
+    def keys(self):
+        return self.snapshot._data.keys()
+
+    @property
+    def exists(self) -> bool:
+        return self.snapshot.exists
+
+    @property
+    def reference(self):
+        return self.snapshot.reference
+
+    def to_dict(self) -> dict:
+        return self.snapshot.to_dict()
+
+    def to_model(self, model):
+        """Builds the dataclass model from the fields it declares, other fields aren't copied"""
+        kwargs = {}
+        for field in dataclasses.fields(model):
+            if field.name in self.snapshot._data:
+                kwargs[field.name] = self.value(field.name)
+        return model(**kwargs)
+
+    def __repr__(self) -> str:
+        return f"Document({self.id!r})"
+
+
+class QueryResults(Mapping):
+    __slots__ = ("documents",)
+
+    def __init__(self, snapshots) -> None:
+        # id -> Document in query order
+        self.documents = {snapshot.id: Document(snapshot) for snapshot in snapshots}
+
+    def __getitem__(self, document_id: str) -> Document:
+        return self.documents[document_id]
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __repr__(self) -> str:
+        return f"QueryResults({len(self.documents)} documents)"
+
+    def to_models(self, model) -> dict:
+        """dict of id -> instance of the dataclass model, see Document.to_model"""
+        return {document_id: document.to_model(model) for document_id, document in self.documents.items()}
+
+    def to_columns(self, fields: list = None) -> dict:
+        """Column oriented copy of the results, {"id": [...], field: [...]}
+
+        Documents without a field get None in its column. Without fields
+        every top level field found in any document gets a column. Query.columns
+        fetches only the fields from the server and then calls this.
+        """
+        if fields is None:
+            seen = {}
+            for document in self.documents.values():
+                seen.update(dict.fromkeys(document.keys()))
+            fields = list(seen)
+
+        columns = {"id": list(self.documents)}
+        for field in fields:
+            columns[field] = [document.value(field, None) for document in self.documents.values()]
+        return columns
@@ -12,5 +12,5 @@ setuptools.setup(
     },
     license='MIT',
     packages=['firestore'],
-    install_requires=['firebase_admin'],
+    install_requires=['firebase_admin', 'instrumentation @ git+https://github.com/pyryhelin/toolbox#subdirectory=instrumentation'],
 )
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Async counterpart of httpsession, built on httpx.
+
+httpx is only needed by the async clients, so it is an optional dependency:
+pip install "httpsession[async]"
+
+Async clients are bound to the event loop they are used on, so unlike the
+sync session there is no process wide instance, every async API client owns
+its own AsyncClient.
+"""
+
+import httpx
+
+from httpsession.httpsession import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+
+
+def create_async_client(
+    pool_size: int = DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT
+) -> httpx.AsyncClient:
+    """Returns an AsyncClient with a keep-alive pool of pool_size connections
+
+    Args:
+        pool_size int: max number of open and kept-alive connections
+        timeout: seconds or (connect, read) tuple, same as PooledSession
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        timeout = httpx.Timeout(read, connect=connect)
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        ),
+        timeout=timeout,
+    )
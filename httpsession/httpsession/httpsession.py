@@ -0,0 +1,94 @@
+"""
+Pooled, keep-alive HTTP sessions shared by the toolbox API clients.
+
+Calling the module level requests.get/post opens a new TCP (and TLS) connection
+for every call. A PooledSession keeps connections to each host open and reuses
+them, so only the first call to a host pays the connection setup.
+
+Every client (ClickUp, VercelKV, LogflareLogger) uses get_session() unless
+it is given a session of its own.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POOL_CONNECTIONS = 10
+
+# (connect timeout, read timeout) in seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+
+
+class PooledSession(requests.Session):
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        timeout=DEFAULT_TIMEOUT,
+        pool_block: bool = False,
+    ) -> None:
+        """Session with a connection pool per host and a default timeout
+
+        Args:
+            pool_size int: max number of kept-alive connections per host
+            pool_connections int: number of hosts to keep a pool for
+            timeout: default timeout for requests, either seconds or (connect, read) tuple
+            pool_block bool: wait for a free connection instead of opening a throwaway one when the pool is exhausted
+        """
+        super().__init__()
+
+        self.timeout = timeout
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_size,
+            pool_block=pool_block,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_session() -> PooledSession:
+    """Returns the process wide session, creating it on first use"""
+    global _default_session
+
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = PooledSession()
+
+    return _default_session
+
+
+def configure(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    timeout=DEFAULT_TIMEOUT,
+    pool_block: bool = False,
+) -> PooledSession:
+    """Replaces the process wide session with one using the given settings
+
+    Clients that were created before calling this keep using the old session.
+    """
+    global _default_session
+
+    with _default_session_lock:
+        _default_session = PooledSession(
+            pool_size=pool_size,
+            pool_connections=pool_connections,
+            timeout=timeout,
+            pool_block=pool_block,
+        )
+
+    return _default_session
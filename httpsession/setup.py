@@ -0,0 +1,17 @@
+import setuptools
+
+setuptools.setup(
+    name='httpsession',
+    version='0.1.11',
+    author='Pyry Helin',
+    author_email='pyr.hel@gmail.com',
+    description='pooled keep-alive http sessions shared by the toolbox api clients',
+    url='https://github.com/pyryhelin/toolbox',
+    project_urls = {
+        "Bug Tracker": "https://github.com/pyryhelin/toolbox/issues"
+    },
+    license='MIT',
+    packages=['httpsession'],
+    install_requires=['requests'],
+    extras_require={'async': ['httpx']},
+)
\ No newline at end of file
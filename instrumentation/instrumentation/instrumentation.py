@@ -0,0 +1,212 @@
+"""
+Call timing, payload sizes and error counts shared by the toolbox clients.
+
+Every client takes an Instrumentation and wraps each call to its backend in a
+span, instead of printing what it does:
+
+    instrumentation = Instrumentation(callbacks=[log_spans()])
+    kv = VercelKV(instrumentation=instrumentation)
+    logger = LogflareLogger(api_key, drain_id, instrumentation=instrumentation)
+
+    instrumentation.stats()
+    # {"vercelkv.get": {"calls": 12, "errors": 0, "seconds": 0.031, "bytes_sent": 0, "bytes_received": 480}, ...}
+
+Callbacks get every finished Span. With a tracer (an OpenTelemetry tracer, or
+anything with start_span(name, attributes=...)) each span is also reported
+as a trace span.
+
+Clients default to DISABLED, which hands out one shared span that does
+nothing, so instrumentation is free apart from a method call when it is not
+used.
+"""
+
+import logging
+import threading
+import time
+
+try:
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    Status = None
+
+
+class Span:
+    __slots__ = ("instrumentation", "name", "attributes", "bytes_sent", "bytes_received", "error", "start", "duration", "trace_span")
+
+    def __init__(self, instrumentation, name: str, attributes: dict) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attributes = attributes
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # exception raised in the span, or a failure reported with fail()
+        self.error = None
+        self.start = None
+        self.duration = None
+        self.trace_span = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def sent(self, size: int):
+        self.bytes_sent += size
+
+    def received(self, size: int):
+        self.bytes_received += size
+
+    def fail(self, error):
+        """Marks the span failed for errors that are handled instead of raised, e.g. a status code"""
+        self.error = error
+
+    def __enter__(self):
+        tracer = self.instrumentation.tracer
+        if tracer is not None:
+            self.trace_span = tracer.start_span(self.name, attributes=self.attributes)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc is not None and self.error is None:
+            self.error = exc
+        self.instrumentation._finish(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+    def sent(self, size: int):
+        pass
+
+    def received(self, size: int):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Instrumentation:
+    enabled = True
+
+    def __init__(self, callbacks: list = None, tracer=None) -> None:
+        """
+        Args:
+            callbacks list: functions called with every finished Span
+            tracer: OpenTelemetry style tracer to report spans to
+        """
+        self.callbacks = list(callbacks or [])
+        self.tracer = tracer
+
+        # span name -> [calls, errors, seconds, bytes_sent, bytes_received]
+        self.totals = {}
+        self.callback_errors = 0
+        self.lock = threading.Lock()
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, name, attributes)
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _finish(self, span: Span):
+        with self.lock:
+            totals = self.totals.get(span.name)
+            if totals is None:
+                totals = self.totals[span.name] = [0, 0, 0.0, 0, 0]
+            totals[0] += 1
+            if span.error is not None:
+                totals[1] += 1
+            totals[2] += span.duration
+            totals[3] += span.bytes_sent
+            totals[4] += span.bytes_received
+
+        if span.trace_span is not None:
+            self._end_trace_span(span)
+
+        for callback in self.callbacks:
+            # a broken callback must not break the call being measured
+            try:
+                callback(span)
+            except Exception:
+                with self.lock:
+                    self.callback_errors += 1
+
+    @staticmethod
+    def _end_trace_span(span: Span):
+        trace_span = span.trace_span
+        trace_span.set_attributes({**span.attributes, "bytes_sent": span.bytes_sent, "bytes_received": span.bytes_received})
+        if span.error is not None:
+            if isinstance(span.error, BaseException):
+                trace_span.record_exception(span.error)
+            if Status is not None:
+                trace_span.set_status(Status(StatusCode.ERROR, str(span.error)))
+        trace_span.end()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "calls": calls,
+                    "errors": errors,
+                    "seconds": seconds,
+                    "bytes_sent": bytes_sent,
+                    "bytes_received": bytes_received,
+                }
+                for name, (calls, errors, seconds, bytes_sent, bytes_received) in self.totals.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.totals.clear()
+            self.callback_errors = 0
+
+
+class _Disabled:
+    enabled = False
+    callbacks = ()
+    tracer = None
+
+    def span(self, name: str, **attributes) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def stats(self) -> dict:
+        return {}
+
+
+DISABLED = _Disabled()
+
+
+def log_spans(logger: logging.Logger = None, level: int = logging.DEBUG):
+    """Returns a callback writing every span to logger, for debugging what the clients do
+
+    Only names, sizes, timings and errors are logged, never the values sent.
+    """
+    logger = logger or logging.getLogger("toolbox")
+
+    def callback(span: Span):
+        if not logger.isEnabledFor(level):
+            return
+        logger.log(
+            level,
+            "%s %.1f ms sent %d B received %d B%s",
+            span.name,
+            span.duration * 1000,
+            span.bytes_sent,
+            span.bytes_received,
+            f" error {span.error}" if span.error is not None else "",
+        )
+
+    return callback
@@ -0,0 +1,16 @@
+import setuptools
+
+setuptools.setup(
+    name='instrumentation',
+    version='0.1.11',
+    author='Pyry Helin',
+    author_email='pyr.hel@gmail.com',
+    description='call timing, payload size and error counters shared by the toolbox api clients',
+    url='https://github.com/pyryhelin/toolbox',
+    project_urls = {
+        "Bug Tracker": "https://github.com/pyryhelin/toolbox/issues"
+    },
+    license='MIT',
+    packages=['instrumentation'],
+    extras_require={'otel': ['opentelemetry-api']},
+)
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+logging.Handler sending records to Logflare through a LogflareLogger.
+
+    logflare = LogflareLogger(api_key, drain_id, app_name="api")
+    logging.getLogger().addHandler(LogflareHandler(logflare, level=logging.INFO))
+
+Records below the handler's level are dropped by logging before they reach
+the handler, so they cost nothing here. Kept records are turned into a
+payload and queued on the logger's batching sender, emit never waits for the
+network (unless the logger's queue is full and its policy is BLOCK).
+
+The message is record.getMessage(), without a formatter pass unless a
+formatter is set on the handler. Exceptions, stack info and fields given
+with extra= go into metadata.
+
+Records logged on the logger's sender thread, or by the http stack while the
+logger is posting (urllib3's debug lines, for one), are dropped. Sending them
+would make every post log more records to post.
+"""
+
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+
+from logflare.logflare import LogflareLogger
+
+
+# attributes every LogRecord has, everything else on a record came from extra=
+RECORD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class LogflareHandler(logging.Handler):
+    def __init__(self, logger: LogflareLogger, level: int = logging.NOTSET, close_logger: bool = False) -> None:
+        """
+        Args:
+            logger LogflareLogger: sends the records
+            level int: minimum level sent
+            close_logger bool: stop the logger's sender when the handler is closed
+        """
+        super().__init__(level)
+        self.logger = logger
+        self.close_logger = close_logger
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if threading.current_thread() is self.logger.sender or getattr(self.logger.posting, "active", False):
+            return False
+
+        # the logger's queue is thread safe, so the handler lock logging.Handler takes around emit isn't needed
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.logger._enqueue(self.payload(record))
+        except Exception:
+            self.handleError(record)
+
+    def payload(self, record: logging.LogRecord) -> dict:
+        metadata = {
+            # same format as LogflareLogger's own entries
+            "time_str": str(datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None)),
+            "loggingLevel": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+
+        if self.logger.app:
+            metadata["app"] = self.logger.app
+
+        if record.exc_info and record.exc_info[0] is not None:
+            exc_type, exc, _ = record.exc_info
+            # exc_text is shared with the other handlers of the record, so the traceback is formatted once
+            if not record.exc_text:
+                record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            metadata["exception"] = {
+                "type": exc_type.__name__,
+                "message": str(exc),
+                "stacktrace": record.exc_text,
+            }
+
+        if record.stack_info:
+            metadata["stack_info"] = record.stack_info
+
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                metadata[key] = value
+
+        message = self.format(record) if self.formatter is not None else record.getMessage()
+        return {
+            "message": message,
+            "metadata": metadata,
+        }
+
+    def flush(self):
+        self.logger.flush()
+
+    def close(self):
+        if self.close_logger:
+            self.logger.exit()
+        super().close()
@@ -1,8 +1,72 @@
+import atexit
+import gzip
+import random
 import requests
-from threading import Timer
+import threading
+import weakref
+from collections import deque
 from datetime import datetime
+from enum import Enum
+from time import monotonic
+
+from httpsession.httpsession import get_session
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from logflare.spool import SegmentSpool
+
+# orjson is several times faster than json, use it when it is installed
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=str)
+except ImportError:
+    import json
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+
+class QUEUE_FULL_POLICY(Enum):
+    # wait for the sender to make room, opt-in: logging calls then wait on the network when the endpoint stalls
+    BLOCK = "block"
+    # discard the oldest queued entry to make room
+    DROP_OLDEST = "drop_oldest"
+    # discard the entry being logged
+    DROP_NEWEST = "drop_newest"
+
+
+def _drain_at_exit(logger_ref):
+    logger = logger_ref()
+    if logger is None or logger.exited:
+        return
+    if logger.spool is not None:
+        # a down endpoint holds up the exit for at most exit_timeout, the rest goes to disk
+        logger._exit_to_spool()
+    else:
+        logger.exit()
+
+
 class LogflareLogger:
-    def __init__(self, api_key, drain_id, flush_interval=5, app_name=None, base_url=None) -> None:
+    def __init__(
+        self,
+        api_key,
+        drain_id,
+        flush_interval=5,
+        app_name=None,
+        base_url=None,
+        session: requests.Session = None,
+        batch_size=100,
+        max_queue_size=10000,
+        full_policy: QUEUE_FULL_POLICY = QUEUE_FULL_POLICY.DROP_OLDEST,
+        max_batch_bytes=1_000_000,
+        compress=True,
+        instrumentation: Instrumentation = None,
+        spool_dir=None,
+        spool_max_bytes=100_000_000,
+        replay_backoff_max=60,
+        exit_timeout=5,
+    ) -> None:
         if base_url:
             self.base_url = base_url
         else:
@@ -10,23 +74,96 @@ class LogflareLogger:
 
 
         self.url = self.base_url + "?source="+drain_id
-        
+
         self.headers = {
             "X-API-KEY": api_key,
             "Content-Type": "application/json",
         }
-        
-        self.buffer = []
+
         self.app = app_name
         self.flush_interval = flush_interval
-        self.timer = None
+        self.batch_size = batch_size
+        self.max_queue_size = max_queue_size
+        self.full_policy = full_policy
+        # upper limit for the uncompressed size of a single request body
+        self.max_batch_bytes = max_batch_bytes
+        self.compress = compress
+
+        # pooled keep-alive session shared with other clients unless one is given
+        self.session = session if session is not None else get_session()
+
+        # timing and sizes of every batch request, off unless given
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
+        # entries waiting to be sent, guarded by condition
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.failed_batches = 0
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.closed = False
+        self.exited = False
+
+        # bodies that could not be sent go to disk and are replayed in order, see spool.py
+        self.spool = SegmentSpool(spool_dir, max_bytes=spool_max_bytes) if spool_dir else None
+        self.replay_backoff_max = replay_backoff_max
+        self.replay_failures = 0
+        self.next_replay = 0.0
+        # seconds spent posting at interpreter exit before the rest is spooled
+        self.exit_timeout = exit_timeout
+
+        # set while a thread is inside _post, records logged by the http stack
+        # then are dropped by LogflareHandler instead of being sent again
+        self.posting = threading.local()
+
+        # the sender is a daemon thread, entries still queued at exit are sent
+        # (or written to the spool) by _drain_at_exit unless exit() was called
+        atexit.register(_drain_at_exit, weakref.ref(self))
+
+        # single long lived sender, flushes when batch_size entries are queued
+        # or flush_interval seconds have passed
+        self.sender = threading.Thread(target=self._run, name="logflare-sender", daemon=True)
+        self.sender.start()
 
     def exit(self):
-        self.flush()
-        if self.timer and self.timer.is_alive():
-            self.timer.cancel()
-    
-    
+        """Sends everything still queued and stops the sender thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        self.sender.join()
+        self.exited = True
+
+        if self.spool is not None:
+            self.spool.close()
+
+    def _exit_to_spool(self):
+        """Posts what is still queued for up to exit_timeout seconds, spools what is left"""
+        deadline = monotonic() + self.exit_timeout
+        with self.condition:
+            self.closed = True
+            batch = self._take_batch(len(self.queue))
+            self.condition.notify_all()
+
+        # the sender may be in the middle of a post or a replay, it stops after that
+        self.sender.join(max(0.0, deadline - monotonic()))
+        posting = not self.sender.is_alive()
+        if posting:
+            # older spooled bodies go first so logs arrive in order
+            self._replay(max_bodies=None, deadline=deadline)
+
+        for body in self._encode_chunks(batch):
+            remaining = deadline - monotonic()
+            if not posting or remaining <= 0 or self.spool.pending() or not self._post(body, timeout=remaining):
+                posting = False
+                self.spool.append(body)
+
+        self.exited = True
+        self.spool.close()
+
+
     def error(self, message, ):
         self._log(message, "ERROR")
 
@@ -35,7 +172,7 @@ class LogflareLogger:
 
     def info(self, message):
         self._log(message, "INFO")
-        
+
 
     def _log(self, message, loggingLevel, code=None):
         metadata = {
@@ -44,38 +181,193 @@ class LogflareLogger:
 
         if self.app:
             metadata["app"] = self.app
-        
+
         if loggingLevel:
             metadata["loggingLevel"] = loggingLevel
-        
+
         if code:
             metadata["code"] = code
 
-    
+
 
         payload = {
             "message": message,
             "metadata": metadata,
         }
-        self.buffer.append(payload)
-        
-        if not self.timer or not self.timer.is_alive():
-            print("Starting timer")
-            self.timer = Timer(self.flush_interval, self.flush)
-            self.timer.start()
+        self._enqueue(payload)
+
+    def _enqueue(self, payload):
+        with self.condition:
+            if self.closed:
+                # no sender is left to send it
+                self.dropped += 1
+                return
+
+            if len(self.queue) >= self.max_queue_size:
+                if self.full_policy == QUEUE_FULL_POLICY.DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                elif self.full_policy == QUEUE_FULL_POLICY.DROP_OLDEST:
+                    self.queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self.queue) >= self.max_queue_size and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        self.dropped += 1
+                        return
+
+            self.queue.append(payload)
+
+            if len(self.queue) >= self.batch_size:
+                self.condition.notify_all()
+
+    def _take_batch(self, size) -> list:
+        # caller must hold self.condition
+        batch = [self.queue.popleft() for _ in range(min(size, len(self.queue)))]
+        if batch:
+            # wake producers blocked on a full queue
+            self.condition.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self.condition:
+                deadline = monotonic() + self.flush_interval
+                while len(self.queue) < self.batch_size and not self.closed:
+                    remaining = deadline - monotonic()
+                    if self.spool is not None and self.spool.pending():
+                        remaining = min(remaining, self.next_replay - monotonic())
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                batch = self._take_batch(self.batch_size)
+
+                if not batch and self.closed:
+                    return
+
+            if batch:
+                self._send(batch)
+
+            if self.spool is not None:
+                self._replay()
 
     def flush(self):
-        if self.timer and self.timer.is_alive():
-            self.timer.cancel()
-        
-        if len(self.buffer) > 0:
-            print("Flushing")
-            print({
-                "batch":self.buffer
-            })
-            response = requests.post(self.url, headers=self.headers, json={
-                "batch":self.buffer
-            })
-            self.buffer = []
-            print("logflare", response.content)
-      
\ No newline at end of file
+        """Sends everything queued so far from the calling thread"""
+        with self.condition:
+            batch = self._take_batch(len(self.queue))
+
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+        for body in self._encode_chunks(batch):
+            if self.spool is None:
+                self._post(body)
+            elif self.spool.pending():
+                # queue behind the spooled bodies so logs arrive in order
+                self.spool.append(body)
+            elif not self._post(body):
+                self.spool.append(body)
+
+    def _replay(self, max_bodies=10, deadline=None):
+        """Sends up to max_bodies (all when None) spooled bodies oldest first, backs off when one fails
+
+        Runs on the sender thread between batches, a long backlog is sent a few
+        bodies at a time so new entries keep moving to the spool instead of
+        filling the queue. With a deadline (a monotonic() time) each post gets
+        the time left as its timeout and replay stops when it runs out.
+        """
+        if monotonic() < self.next_replay:
+            return
+
+        replayed = 0
+        while max_bodies is None or replayed < max_bodies:
+            record = self.spool.peek()
+            if record is None:
+                self.replay_failures = 0
+                return
+
+            position, body = record
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - monotonic()
+                if timeout <= 0:
+                    return
+
+            if not self._post(body, timeout=timeout):
+                self.replay_failures += 1
+                backoff = min(self.replay_backoff_max, 2 ** self.replay_failures)
+                self.next_replay = monotonic() + random.uniform(backoff / 2, backoff)
+                return
+
+            self.spool.ack(position)
+            replayed += 1
+
+    def _encode_chunks(self, batch):
+        """Yields {"batch": [...]} bodies that are at most max_batch_bytes each
+
+        Entries are encoded one by one so the chunks can be joined without
+        encoding anything twice. An entry bigger than max_batch_bytes is sent
+        in a chunk of its own.
+        """
+        # size of the {"batch":[]} wrapper
+        empty_size = 12
+
+        chunk = []
+        chunk_size = empty_size
+        for entry in batch:
+            encoded = _dumps(entry)
+            if chunk and chunk_size + 1 + len(encoded) > self.max_batch_bytes:
+                yield b'{"batch":[' + b",".join(chunk) + b"]}"
+                chunk = []
+                chunk_size = empty_size
+
+            if chunk:
+                # separating comma
+                chunk_size += 1
+            chunk.append(encoded)
+            chunk_size += len(encoded)
+
+        if chunk:
+            yield b'{"batch":[' + b",".join(chunk) + b"]}"
+
+    def _post(self, body: bytes, timeout=None) -> bool:
+        """Sends one body, returns False when it failed in a way that is worth retrying
+
+        Args:
+            timeout float: seconds to wait for the connection and for each read, no limit when None
+        """
+        headers = self.headers
+        raw_size = len(body)
+        if self.compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers = {**self.headers, "Content-Encoding": "gzip"}
+
+        with self.instrumentation.span("logflare.post", uncompressed_bytes=raw_size) as span:
+            span.sent(len(body))
+            self.posting.active = True
+            try:
+                response = self.session.post(self.url, headers=headers, data=body, timeout=timeout)
+            except requests.RequestException as e:
+                span.fail(e)
+                with self.condition:
+                    self.failed_batches += 1
+                return False
+            finally:
+                self.posting.active = False
+
+            span.received(len(response.content))
+            if response.status_code >= 300:
+                span.fail(f"HTTP {response.status_code}")
+                with self.condition:
+                    self.failed_batches += 1
+                # other client errors would fail the same way again
+                return response.status_code != 429 and response.status_code < 500
+
+        with self.condition:
+            self.batches_sent += 1
+            self.bytes_sent += len(body)
+            self.bytes_saved += raw_size - len(body)
+        return True
@@ -0,0 +1,234 @@
+"""
+Append-only on-disk spool for request bodies Logflare did not accept.
+
+Bodies are appended as records to numbered segment files in a directory:
+
+    000000000000.seg  000000000001.seg  ...  head
+
+each record being a 4 byte length, a 4 byte crc32 and the body. The head file
+holds the segment and offset of the oldest record not yet acknowledged.
+Records are read back in the order they were written, acknowledging a record
+moves the head past it and segments the head has moved past are deleted, so
+the spool only takes disk space while there is something to replay.
+
+The spool is capped at max_bytes: when a record doesn't fit, the oldest
+segments are dropped to make room. A record torn by a crash is detected by
+its checksum and cut off when the spool is opened again.
+"""
+
+import os
+import struct
+import threading
+import zlib
+
+HEADER = struct.Struct(">II")
+HEAD_FILE = "head"
+SEGMENT_SUFFIX = ".seg"
+
+
+class SegmentSpool:
+    def __init__(self, directory: str, max_bytes: int = 100_000_000, segment_bytes: int = 4_000_000, fsync: bool = True) -> None:
+        """
+        Args:
+            directory str: where segments are kept, created if missing
+            max_bytes int: disk budget for all segments
+            segment_bytes int: size after which a new segment is started
+            fsync bool: fsync every append and acknowledgement so they survive power loss
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.lock = threading.Lock()
+
+        self.appended = 0
+        self.acked = 0
+        self.dropped_segments = 0
+        self.dropped_bytes = 0
+        self.rejected = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        # ids of the segment files on disk, oldest first, the last one is appended to
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        if not self.segments:
+            self.segments = [0]
+
+        self.sizes = {segment: self._valid_size(segment) for segment in self.segments}
+        self.head_segment, self.head_offset = self._read_head()
+
+        # cut a record torn by a crash off the segment that is appended to
+        tail = self.segments[-1]
+        self.writer = open(self._path(tail), "ab")
+        self.writer.truncate(self.sizes[tail])
+
+        self._compact()
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _valid_size(self, segment: int) -> int:
+        """Bytes of the segment up to the first torn or corrupted record"""
+        path = self._path(segment)
+        if not os.path.exists(path):
+            return 0
+
+        offset = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return offset
+                length, checksum = HEADER.unpack(header)
+                body = f.read(length)
+                if len(body) < length or zlib.crc32(body) != checksum:
+                    return offset
+                offset += HEADER.size + length
+
+    def _read_head(self) -> tuple:
+        try:
+            with open(os.path.join(self.directory, HEAD_FILE)) as f:
+                segment, offset = (int(part) for part in f.read().split())
+        except (OSError, ValueError):
+            return self.segments[0], 0
+
+        if segment not in self.sizes:
+            # the head segment is gone, continue with the oldest one left
+            return self.segments[0], 0
+        return segment, min(offset, self.sizes[segment])
+
+    def _write_head(self):
+        path = os.path.join(self.directory, HEAD_FILE)
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{self.head_segment} {self.head_offset}")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _size(self) -> int:
+        return sum(self.sizes.values())
+
+    def _start_segment(self):
+        # caller holds self.lock
+        self.writer.close()
+        segment = self.segments[-1] + 1
+        self.segments.append(segment)
+        self.sizes[segment] = 0
+        self.writer = open(self._path(segment), "ab")
+
+    def _drop_oldest(self):
+        # caller holds self.lock, never drops the segment being appended to
+        segment = self.segments.pop(0)
+        self.dropped_segments += 1
+        self.dropped_bytes += self.sizes.pop(segment)
+        os.remove(self._path(segment))
+        if self.head_segment == segment:
+            self.head_segment, self.head_offset = self.segments[0], 0
+            self._write_head()
+
+    def _compact(self):
+        # caller holds self.lock (or is __init__), deletes segments the head has passed
+        while self.head_segment != self.segments[0]:
+            segment = self.segments.pop(0)
+            del self.sizes[segment]
+            os.remove(self._path(segment))
+
+        tail = self.segments[-1]
+        if self.head_segment == tail and self.head_offset >= self.sizes[tail] > 0:
+            # everything is acknowledged, start over in an empty segment
+            self._start_segment()
+            self.segments.pop(0)
+            del self.sizes[tail]
+            os.remove(self._path(tail))
+            self.head_segment, self.head_offset = self.segments[0], 0
+            self._write_head()
+
+    def append(self, body: bytes) -> bool:
+        """Appends body, returns False if it is bigger than the disk budget"""
+        record = HEADER.pack(len(body), zlib.crc32(body)) + body
+
+        with self.lock:
+            if len(record) > self.max_bytes:
+                self.rejected += 1
+                return False
+
+            while self._size() + len(record) > self.max_bytes and len(self.segments) > 1:
+                self._drop_oldest()
+
+            tail = self.segments[-1]
+            if self._size() + len(record) > self.max_bytes:
+                # only the segment being appended to is left, nothing in it can be acknowledged later
+                self.dropped_segments += 1
+                self.dropped_bytes += self.sizes[tail]
+                self._start_segment()
+                self.segments.pop(0)
+                del self.sizes[tail]
+                os.remove(self._path(tail))
+                self.head_segment, self.head_offset = self.segments[0], 0
+                self._write_head()
+                tail = self.segments[-1]
+            elif self.sizes[tail] and self.sizes[tail] + len(record) > self.segment_bytes:
+                self._start_segment()
+                tail = self.segments[-1]
+
+            self.writer.write(record)
+            self.writer.flush()
+            if self.fsync:
+                os.fsync(self.writer.fileno())
+            self.sizes[tail] += len(record)
+            self.appended += 1
+            return True
+
+    def pending(self) -> bool:
+        with self.lock:
+            return self.head_segment != self.segments[-1] or self.head_offset < self.sizes[self.head_segment]
+
+    def peek(self):
+        """Returns (position, body) of the oldest unacknowledged record, None when there is none"""
+        with self.lock:
+            while self.head_offset >= self.sizes[self.head_segment]:
+                if self.head_segment == self.segments[-1]:
+                    return None
+                # the rest of a segment cut short by corruption is skipped
+                self.head_segment, self.head_offset = self.segments[1], 0
+                self._write_head()
+                self._compact()
+
+            segment, offset = self.head_segment, self.head_offset
+            with open(self._path(segment), "rb") as f:
+                f.seek(offset)
+                length, _ = HEADER.unpack(f.read(HEADER.size))
+                body = f.read(length)
+
+            return (segment, offset + HEADER.size + length), body
+
+    def ack(self, position: tuple):
+        """Acknowledges every record up to position returned by peek"""
+        with self.lock:
+            segment, offset = position
+            if segment not in self.sizes:
+                # dropped for the disk budget in the meantime
+                return
+            self.head_segment, self.head_offset = segment, offset
+            self.acked += 1
+            self._write_head()
+            self._compact()
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "segments": len(self.segments),
+                "bytes": self._size(),
+                "appended": self.appended,
+                "acked": self.acked,
+                "dropped_segments": self.dropped_segments,
+                "dropped_bytes": self.dropped_bytes,
+                "rejected": self.rejected,
+            }
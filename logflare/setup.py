@@ -12,5 +12,6 @@ setuptools.setup(
     },
     license='MIT',
     packages=['logflare'],
-    install_requires=['requests'],
+    install_requires=['requests', 'httpsession @ git+https://github.com/pyryhelin/toolbox#subdirectory=httpsession', 'instrumentation @ git+https://github.com/pyryhelin/toolbox#subdirectory=instrumentation'],
+    extras_require={'fast': ['orjson']},
 )
\ No newline at end of file
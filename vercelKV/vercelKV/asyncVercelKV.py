@@ -0,0 +1,239 @@
+"""
+Asyncio version of VercelKV.
+
+Same methods as VercelKV, as coroutines running on httpx. A semaphore caps the
+number of requests in flight per client.
+
+Needs the async extra: pip install "vercelKV[async]"
+"""
+
+import asyncio
+import json
+import os
+
+import httpx
+from httpsession.asyncsession import create_async_client
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from vercelKV.cache import KVCache, MISSING
+from vercelKV.pipeline import AsyncPipeline
+from vercelKV.serializers import TypedCodec
+from vercelKV.vercelKV import VercelKV
+
+
+class AsyncVercelKV:
+    def __init__(
+        self,
+        max_concurrency: int = 20,
+        client: httpx.AsyncClient = None,
+        cache: KVCache = None,
+        pipeline_size: int = 1000,
+        base_url: str = None,
+        token: str = None,
+        typed: bool = False,
+        serializer=None,
+        instrumentation: Instrumentation = None,
+    ):
+        self.token = token or os.getenv("KV_REST_API_TOKEN")
+        self.base_url = base_url or os.getenv("KV_REST_API_URL")
+
+        self.client = client if client is not None else create_async_client(max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        # optional read-through cache in front of get
+        self.cache = cache
+
+        # max commands sent in one pipeline request
+        self.pipeline_size = pipeline_size
+
+        # same storage modes as VercelKV
+        self.typed = typed or serializer is not None
+        self.codec = TypedCodec(serializer)
+
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+
+    async def _send_request(self, method, command, key, value=None, body: str = None):
+        url = f"{self.base_url}/{command}/{key}"
+        headers = self._headers()
+        data = body if body is not None else json.dumps(value) if value is not None else None
+
+        async with self.semaphore:
+            with self.instrumentation.span(f"vercelkv.{command}") as span:
+                response = await self.client.request(method, url, headers=headers, content=data)
+                span.sent(len(data) if data else 0)
+                span.received(len(response.content))
+                if response.status_code != 200:
+                    span.fail(f"HTTP {response.status_code}")
+        return response
+
+    async def _send_command(self, command: list):
+        data = json.dumps(command)
+        async with self.semaphore:
+            with self.instrumentation.span(f"vercelkv.{command[0].lower()}") as span:
+                response = await self.client.post(self.base_url, headers=self._headers(), content=data)
+                span.sent(len(data))
+                span.received(len(response.content))
+                if response.status_code != 200:
+                    span.fail(f"HTTP {response.status_code}")
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to run {command[0]} on key {command[1]}. Response: {response.text}")
+        return response.json().get("result")
+
+    _encode_set = VercelKV._encode_set
+    _decode_result = VercelKV._decode_result
+    _decode_hash = VercelKV._decode_hash
+    _decode_get = staticmethod(VercelKV._decode_get)
+
+    async def set(self, key, value, ex: int = None):
+        stored, cached = self._encode_set(value)
+
+        try:
+            if ex is None:
+                response = await self._send_request("POST", "set", key, body=stored)
+                if response.status_code != 200:
+                    raise Exception(f"Failed to set key {key}. Response: {response.text}")
+            else:
+                await self._send_command(["SET", key, stored, "EX", ex])
+        except Exception:
+            if self.cache:
+                self.cache.invalidate(key)
+            raise
+
+        if self.cache:
+            self.cache.put(key, cached, len(stored), ttl=ex if ex is not None and ex < self.cache.ttl else None)
+        return True
+
+    async def get(self, key, cache_ttl: float = None):
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not MISSING:
+                return cached
+
+        response = await self._send_request("GET", "get", key)
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to get key {key}. Response: {response.text}")
+
+        value = self._decode_result(response.json())
+
+        if self.cache:
+            self.cache.put(key, value, len(response.content), ttl=cache_ttl)
+
+        return value
+
+    async def delete(self, key):
+        try:
+            response = await self._send_request("POST", "del", key)
+        finally:
+            # after the write, so a get racing it can't cache the old value again
+            if self.cache:
+                self.cache.invalidate(key)
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to delete key {key}. Response: {response.text}")
+        return True
+
+    async def update(self, key, value):
+        try:
+            response = await self._send_request("POST", "set", key, value)
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
+        if response.status_code != 200:
+            raise Exception(f"Failed to update key {key}. Response: {response.text}")
+
+    async def _send_pipeline(self, commands):
+        results = []
+        for i in range(0, len(commands), self.pipeline_size):
+            chunk = commands[i:i + self.pipeline_size]
+            data = json.dumps(chunk)
+            async with self.semaphore:
+                with self.instrumentation.span("vercelkv.pipeline", commands=len(chunk)) as span:
+                    response = await self.client.post(f"{self.base_url}/pipeline", headers=self._headers(), content=data)
+                    span.sent(len(data))
+                    span.received(len(response.content))
+                    if response.status_code != 200:
+                        span.fail(f"HTTP {response.status_code}")
+
+            if response.status_code != 200:
+                raise Exception(f"Failed to run pipeline of {len(chunk)} commands. Response: {response.text}")
+            results.extend(response.json())
+        return results
+
+    def pipeline(self, raise_on_error=True) -> AsyncPipeline:
+        return AsyncPipeline(self, raise_on_error=raise_on_error)
+
+    async def mget(self, keys):
+        values = [MISSING] * len(keys)
+        if self.cache:
+            values = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, value in enumerate(values) if value is MISSING]
+        if missing:
+            async with self.pipeline() as pipe:
+                for i in missing:
+                    pipe.get(keys[i])
+
+            for i, value in zip(missing, pipe.results):
+                values[i] = value
+
+        return values
+
+    async def mset(self, items: dict):
+        async with self.pipeline() as pipe:
+            for key, value in items.items():
+                pipe.set(key, value)
+        return True
+
+    async def mdelete(self, keys):
+        async with self.pipeline() as pipe:
+            for key in keys:
+                pipe.delete(key)
+        return True
+
+    async def incr(self, key, amount=1):
+        try:
+            if isinstance(amount, float):
+                return float(await self._send_command(["INCRBYFLOAT", key, amount]))
+            return await self._send_command(["INCRBY", key, amount])
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
+
+    async def expire(self, key, seconds: int):
+        try:
+            return await self._send_command(["EXPIRE", key, seconds]) == 1
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
+
+    async def hset(self, key, mapping: dict):
+        args = []
+        for field, value in mapping.items():
+            args += [field, self.codec.encode(value)]
+        return await self._send_command(["HSET", key, *args])
+
+    async def hget(self, key, field):
+        return self.codec.decode(await self._send_command(["HGET", key, field]))
+
+    async def hgetall(self, key) -> dict:
+        return self._decode_hash(await self._send_command(["HGETALL", key]))
+
+    async def hincr(self, key, field, amount: int = 1):
+        return await self._send_command(["HINCRBY", key, field, amount])
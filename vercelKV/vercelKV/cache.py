@@ -0,0 +1,116 @@
+"""
+In-process read-through cache for VercelKV.
+
+Entries expire after a ttl and the least recently used ones are evicted once
+the cached values take more than max_bytes. Sizes are the length of the
+encoded value as it came over the wire, which is close enough to size the
+cache without walking python objects.
+
+Typed mode caches dicts, lists and other containers. Those are copied when
+they are put and again on every hit, so changing a value after set or
+changing what get returned never changes what the next get returns.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+# returned by KVCache.get when the key is not cached, None is a valid cached value
+MISSING = object()
+
+# values that can be changed in place, or hold something that can
+_CONTAINERS = (dict, list, set, bytearray, tuple)
+
+
+def copy_value(value):
+    # str, bytes, numbers, bools and None are immutable and shared as is
+    if isinstance(value, _CONTAINERS):
+        return copy.deepcopy(value)
+    return value
+
+
+class KVCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 60) -> None:
+        """
+        Args:
+            max_bytes int: upper limit for the summed size of cached values
+            ttl float: default seconds an entry stays valid
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key -> (value, expires_at, size), oldest first
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, expires_at, size = entry
+            if expires_at <= monotonic():
+                del self.entries[key]
+                self.size -= size
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return copy_value(value)
+
+    def put(self, key, value, size: int, ttl: float = None):
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+
+        expires_at = monotonic() + (self.ttl if ttl is None else ttl)
+        value = copy_value(value)
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+
+            self.entries[key] = (value, expires_at, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
@@ -0,0 +1,255 @@
+"""
+Local emulator of the Vercel KV / Upstash REST api.
+
+Runs an in-memory store behind an http server in a background thread, so
+VercelKV can be tested and benchmarked without the live endpoint:
+
+    with KVEmulator(latency=0.002) as emulator:
+        kv = VercelKV(base_url=emulator.url, token=emulator.token)
+
+Supports the commands the client sends: /{command}/{args...} with an optional
+request body as the last argument, and POST /pipeline with a json array of
+commands. latency is slept on every request to mimic the network.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+class KVEmulator:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, token: str = "emulator") -> None:
+        """
+        Args:
+            host str: interface to listen on
+            port int: port to listen on, 0 picks a free one
+            latency float: seconds added to every request
+            token str: bearer token requests must have, None accepts any
+        """
+        self.latency = latency
+        self.token = token
+
+        # key -> value, expiry times in expires
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+        self.commands = {
+            "SET": self._set,
+            "GET": self._get,
+            "DEL": self._del,
+            "MGET": self._mget,
+            "MSET": self._mset,
+            "EXISTS": self._exists,
+            "INCRBY": self._incrby,
+            "INCRBYFLOAT": self._incrbyfloat,
+            "EXPIRE": self._expire,
+            "TTL": self._ttl,
+            "HSET": self._hset,
+            "HGET": self._hget,
+            "HGETALL": self._hgetall,
+            "HDEL": self._hdel,
+            "HINCRBY": self._hincrby,
+            "FLUSHALL": self._flushall,
+        }
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="kv-emulator", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def execute(self, command: list) -> dict:
+        """Runs one command, returns {"result": ...} or {"error": ...} like the REST api"""
+        name = str(command[0]).upper()
+        if name not in self.commands:
+            return {"error": f"ERR unknown command '{name}'"}
+
+        with self.lock:
+            try:
+                return {"result": self.commands[name](*command[1:])}
+            except (TypeError, ValueError) as e:
+                return {"error": f"ERR {e}"}
+
+    def _alive(self, key) -> bool:
+        # caller holds self.lock
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return key in self.data
+
+    def _set(self, key, value, *options):
+        self.data[key] = value if isinstance(value, str) else json.dumps(value)
+        self.expires.pop(key, None)
+
+        options = [str(option).upper() for option in options]
+        if "EX" in options:
+            self.expires[key] = time.time() + int(options[options.index("EX") + 1])
+        elif "PX" in options:
+            self.expires[key] = time.time() + int(options[options.index("PX") + 1]) / 1000
+        return "OK"
+
+    def _get(self, key):
+        if not self._alive(key):
+            return None
+        if isinstance(self.data[key], dict):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return self.data[key]
+
+    def _hash(self, key, create: bool = False) -> dict:
+        if not self._alive(key):
+            if not create:
+                return {}
+            self.data[key] = {}
+        if not isinstance(self.data[key], dict):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return self.data[key]
+
+    def _del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                deleted += 1
+        return deleted
+
+    def _mget(self, *keys):
+        return [self._get(key) for key in keys]
+
+    def _mset(self, *pairs):
+        if len(pairs) % 2:
+            raise ValueError("wrong number of arguments for 'mset' command")
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self._set(key, value)
+        return "OK"
+
+    def _exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def _incrby(self, key, amount):
+        value = int(self._get(key) or 0) + int(amount)
+        self.data[key] = str(value)
+        return value
+
+    def _incrbyfloat(self, key, amount):
+        value = float(self._get(key) or 0) + float(amount)
+        self.data[key] = repr(value)
+        # redis answers INCRBYFLOAT with a string
+        return repr(value)
+
+    def _expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def _ttl(self, key):
+        if not self._alive(key):
+            return -2
+        if key not in self.expires:
+            return -1
+        return int(self.expires[key] - time.time())
+
+    def _hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError("wrong number of arguments for 'hset' command")
+        fields = self._hash(key, create=True)
+        added = sum(1 for field in pairs[::2] if str(field) not in fields)
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            fields[str(field)] = str(value)
+        return added
+
+    def _hget(self, key, field):
+        return self._hash(key).get(str(field))
+
+    def _hgetall(self, key):
+        return [item for pair in self._hash(key).items() for item in pair]
+
+    def _hdel(self, key, *fields):
+        hash_fields = self._hash(key)
+        return sum(1 for field in fields if hash_fields.pop(str(field), None) is not None)
+
+    def _hincrby(self, key, field, amount):
+        fields = self._hash(key, create=True)
+        value = int(fields.get(str(field), 0)) + int(amount)
+        fields[str(field)] = str(value)
+        return value
+
+    def _flushall(self):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    def _handler(self):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _reply(self, status: int, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else None
+
+                if emulator.latency:
+                    time.sleep(emulator.latency)
+
+                if emulator.token is not None and self.headers.get("Authorization") != f"Bearer {emulator.token}":
+                    return self._reply(401, {"error": "Unauthorized"})
+
+                parts = [unquote(part) for part in self.path.strip("/").split("/") if part]
+
+                if parts == ["pipeline"]:
+                    try:
+                        commands = json.loads(body)
+                    except (TypeError, ValueError):
+                        return self._reply(400, {"error": "ERR pipeline body must be a json array"})
+                    return self._reply(200, [emulator.execute(command) for command in commands])
+
+                if not parts:
+                    if body is None:
+                        return self._reply(400, {"error": "ERR empty command"})
+                    parts = json.loads(body)
+                elif body is not None:
+                    parts.append(body)
+
+                result = emulator.execute(parts)
+                self._reply(400 if "error" in result else 200, result)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,147 @@
+"""
+Batched VercelKV commands.
+
+Commands queued on a Pipeline are sent to the Upstash compatible /pipeline
+endpoint when the with block exits (or execute() is called), in chunks of
+VercelKV.pipeline_size commands per request. Results are in the order the
+commands were queued and are decoded the same way as the single key methods.
+
+    with kv.pipeline() as pipe:
+        pipe.set("a", 1)
+        pipe.get("b")
+    pipe.results  # [True, "..."]
+"""
+
+import json
+
+from vercelKV.cache import copy_value
+
+
+class PipelineError(Exception):
+    def __init__(self, errors: list) -> None:
+        self.errors = errors
+        super().__init__(f"{len(errors)} pipeline command(s) failed: {errors}")
+
+
+class Pipeline:
+    def __init__(self, kv, raise_on_error: bool = True) -> None:
+        """
+        Args:
+            kv: VercelKV the commands are sent with
+            raise_on_error bool: raise PipelineError if any command failed,
+                otherwise failed commands have an Exception in results
+        """
+        self.kv = kv
+        self.raise_on_error = raise_on_error
+
+        self.commands = []
+        # (kind, key, (value, size) for sets) for decoding each result
+        self.decoders = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+    def __len__(self):
+        return len(self.commands)
+
+    def _queue(self, command: list, kind: str, key, cached=None):
+        self.commands.append(command)
+        self.decoders.append((kind, key, cached))
+        return self
+
+    def set(self, key, value):
+        stored, cached = self.kv._encode_set(value)
+        if self.kv.cache:
+            # value may change before execute, the cache must get what was sent
+            cached = copy_value(cached)
+        return self._queue(["SET", key, stored], "set", key, (cached, len(stored)))
+
+    def get(self, key):
+        return self._queue(["GET", key], "get", key)
+
+    def delete(self, key):
+        return self._queue(["DEL", key], "delete", key)
+
+    def update(self, key, value):
+        return self._queue(["SET", key, json.dumps(value)], "update", key)
+
+    def execute(self) -> list:
+        try:
+            responses = self.kv._send_pipeline(self.commands) if self.commands else []
+        except Exception:
+            self._abort()
+            raise
+        return self._collect(responses)
+
+    def _abort(self):
+        # earlier chunks may already have changed keys on the server, none of the cached values can be trusted
+        if self.kv.cache:
+            for _, key, _ in self.decoders:
+                self.kv.cache.invalidate(key)
+        self.commands = []
+        self.decoders = []
+
+    def _collect(self, responses: list) -> list:
+        cache = self.kv.cache
+
+        self.results = []
+        errors = []
+        for command, (kind, key, cached), response in zip(self.commands, self.decoders, responses):
+            if "error" in response:
+                error = Exception(f"Command {command[0]} on key {key} failed: {response['error']}")
+                errors.append(error)
+                self.results.append(error)
+                if cache:
+                    cache.invalidate(key)
+                continue
+
+            result = response.get("result")
+
+            if kind == "get":
+                value = self.kv._decode_result(response)
+                if cache:
+                    cache.put(key, value, len(result) if result else 0)
+                self.results.append(value)
+            elif kind == "set":
+                if cache:
+                    cache.put(key, *cached)
+                self.results.append(True)
+            else:
+                if cache:
+                    cache.invalidate(key)
+                self.results.append(True)
+
+        self.commands = []
+        self.decoders = []
+
+        if errors and self.raise_on_error:
+            raise PipelineError(errors)
+
+        return self.results
+
+
+class AsyncPipeline(Pipeline):
+    """Pipeline for AsyncVercelKV, used with async with and awaited execute()"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.execute()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' for pipelines of AsyncVercelKV")
+
+    async def execute(self) -> list:
+        try:
+            responses = await self.kv._send_pipeline(self.commands) if self.commands else []
+        except Exception:
+            self._abort()
+            raise
+        return self._collect(responses)
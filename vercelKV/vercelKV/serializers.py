@@ -0,0 +1,84 @@
+"""
+Value encodings for VercelKV's typed mode.
+
+Redis stores strings, so typed mode needs one encoding per value that can be
+read back with its type. Ints and floats are always stored as plain numerals,
+which keeps them usable with INCRBY/INCRBYFLOAT and decodes them without a
+json pass. Everything else goes through a serializer:
+
+    JSONSerializer     json (orjson when installed), bytes as base64
+    MsgpackSerializer  msgpack, base64 encoded since the REST api moves text
+
+Serialized values never start with a digit or "-" and are never one of the
+bare words inf and nan (json strings are quoted), so numerals and serialized
+values can't be mistaken for each other.
+"""
+
+import base64
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONSerializer:
+    BYTES_PREFIX = "b64:"
+
+    def dumps(self, value) -> str:
+        if isinstance(value, (bytes, bytearray)):
+            return self.BYTES_PREFIX + base64.b64encode(value).decode()
+        if orjson is not None:
+            return orjson.dumps(value).decode()
+        return json.dumps(value, separators=(",", ":"))
+
+    def loads(self, raw: str):
+        if raw.startswith(self.BYTES_PREFIX):
+            return base64.b64decode(raw[len(self.BYTES_PREFIX):])
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+
+
+class MsgpackSerializer:
+    PREFIX = "mp:"
+
+    def __init__(self) -> None:
+        # only needed when msgpack is chosen
+        import msgpack
+
+        self.msgpack = msgpack
+
+    def dumps(self, value) -> str:
+        return self.PREFIX + base64.b64encode(self.msgpack.packb(value, use_bin_type=True)).decode()
+
+    def loads(self, raw: str):
+        if not raw.startswith(self.PREFIX):
+            # written by another serializer, numerals are handled by TypedCodec
+            return JSONSerializer().loads(raw)
+        return self.msgpack.unpackb(base64.b64decode(raw[len(self.PREFIX):]), raw=False)
+
+
+class TypedCodec:
+    def __init__(self, serializer=None) -> None:
+        self.serializer = serializer if serializer is not None else JSONSerializer()
+
+    def encode(self, value) -> str:
+        # bool is an int subclass but must keep its type
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return repr(value)
+        return self.serializer.dumps(value)
+
+    def decode(self, raw):
+        if raw is None:
+            return None
+        # repr of a non-finite float, "-inf" is caught by the numeral branch
+        if raw == "inf" or raw == "nan":
+            return float(raw)
+        if raw and raw[0] in "-0123456789":
+            try:
+                return int(raw)
+            except ValueError:
+                return float(raw)
+        return self.serializer.loads(raw)
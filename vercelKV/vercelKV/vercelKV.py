@@ -2,48 +2,141 @@ import requests
 import json
 import os
 
+from httpsession.httpsession import get_session
+from instrumentation.instrumentation import DISABLED, Instrumentation
+
+from vercelKV.cache import KVCache, MISSING
+from vercelKV.pipeline import Pipeline
+from vercelKV.serializers import TypedCodec
+
 
 class VercelKV:
-    def __init__(self):
-        self.token = os.getenv("KV_REST_API_TOKEN") 
-        self.base_url = os.getenv("KV_REST_API_URL") 
+    def __init__(self, session: requests.Session = None, cache: KVCache = None, pipeline_size: int = 1000, base_url: str = None, token: str = None, typed: bool = False, serializer=None, instrumentation: Instrumentation = None):
+        # defaults to the env variables vercel sets for linked kv stores
+        self.token = token or os.getenv("KV_REST_API_TOKEN") 
+        self.base_url = base_url or os.getenv("KV_REST_API_URL") 
 
+        # pooled keep-alive session shared with other clients unless one is given
+        self.session = session if session is not None else get_session()
 
-    def _send_request(self, method, command, key, value=None):
-        url = f"{self.base_url}/{command}/{key}"
-        headers = {
+        # optional read-through cache in front of get
+        self.cache = cache
+
+        # max commands sent in one pipeline request
+        self.pipeline_size = pipeline_size
+
+        # typed mode stores values with their type (numbers as numerals, the rest
+        # through serializer) instead of {"value": str(value)}, see serializers.py
+        self.typed = typed or serializer is not None
+        self.codec = TypedCodec(serializer)
+
+        # timing and payload sizes of every request, off unless given
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+
+
+    def _headers(self):
+        return {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
-        data = json.dumps(value) if value is not None else None
-        response = requests.request(method, url, headers=headers, data=data)
+
+
+    def _send_request(self, method, command, key, value=None, body: str = None):
+        url = f"{self.base_url}/{command}/{key}"
+        headers = self._headers()
+        data = body if body is not None else json.dumps(value) if value is not None else None
+
+        with self.instrumentation.span(f"vercelkv.{command}") as span:
+            response = self.session.request(method, url, headers=headers, data=data)
+            span.sent(len(data) if data else 0)
+            span.received(len(response.content))
+            if response.status_code != 200:
+                span.fail(f"HTTP {response.status_code}")
         return response
 
 
-    def set(self, key, value):
-        print(f"Setting key "{key}" with value "{value}"")
-        value = {"value": str(value)}
-        response = self._send_request("POST", "set", key, value)
-        
+    def _send_command(self, command: list):
+        # commands that don't fit the /command/key form are posted as a json array
+        data = json.dumps(command)
+        with self.instrumentation.span(f"vercelkv.{command[0].lower()}") as span:
+            response = self.session.post(self.base_url, headers=self._headers(), data=data)
+            span.sent(len(data))
+            span.received(len(response.content))
+            if response.status_code != 200:
+                span.fail(f"HTTP {response.status_code}")
+
         if response.status_code != 200:
-            raise Exception(f"Failed to set key {key}. Response: {response.text}")
+            raise Exception(f"Failed to run {command[0]} on key {command[1]}. Response: {response.text}")
+        return response.json().get("result")
+
+
+    def _encode_set(self, value):
+        """Returns the string stored for value and the value get returns for it"""
+        if self.typed:
+            return self.codec.encode(value), value
+
+        stored = str(value)
+        return json.dumps({"value": stored}), stored
+
+
+    def _decode_result(self, j):
+        if self.typed:
+            return self.codec.decode(j.get("result"))
+        return self._decode_get(j)
+
+
+    def set(self, key, value, ex: int = None):
+        """Stores value at key
+
+        Args:
+            ex int: seconds until the key expires
+        """
+        stored, cached = self._encode_set(value)
+
+        try:
+            if ex is None:
+                response = self._send_request("POST", "set", key, body=stored)
+                if response.status_code != 200:
+                    raise Exception(f"Failed to set key {key}. Response: {response.text}")
+            else:
+                self._send_command(["SET", key, stored, "EX", ex])
+        except Exception:
+            if self.cache:
+                self.cache.invalidate(key)
+            raise
+
+        if self.cache:
+            # get would return the same value, the cache keeps its own copy
+            self.cache.put(key, cached, len(stored), ttl=ex if ex is not None and ex < self.cache.ttl else None)
         return True 
 
 
-    def get(self, key):
-        print(f"Getting key "{key}"")
+    def get(self, key, cache_ttl: float = None):
+        """Returns the value of key, None if it is not set
+
+        Args:
+            cache_ttl float: seconds to cache this key for, overrides the cache default
+        """
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not MISSING:
+                return cached
+
         response = self._send_request("GET", "get", key)
         
         if response.status_code != 200:
             raise Exception(f"Failed to get key {key}. Response: {response.text}")
-        
 
-        j = response.json()
+        j = self._decode_result(response.json())
 
+        if self.cache:
+            self.cache.put(key, j, len(response.content), ttl=cache_ttl)
+
+        return j
 
-        print(f"Raw GET: '{j}'")
-        
 
+    @staticmethod
+    def _decode_get(j):
         if not "result" in j:
             return None
         
@@ -57,14 +150,16 @@ class VercelKV:
             j = inner_json["value"]
 
 
-        print(f"Cleaned GET: "{j}"")
-
-
         return j
 
 
     def delete(self, key):
-        response = self._send_request("POST", "del", key)
+        try:
+            response = self._send_request("POST", "del", key)
+        finally:
+            # after the write, so a get racing it can't cache the old value again
+            if self.cache:
+                self.cache.invalidate(key)
 
         if response.status_code != 200:
             raise Exception(f"Failed to delete key {key}. Response: {response.text}")
@@ -72,6 +167,117 @@ class VercelKV:
 
 
     def update(self, key, value):
-        response = self._send_request("POST", "set", key, value)
+        try:
+            response = self._send_request("POST", "set", key, value)
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
         if response.status_code != 200:
             raise Exception(f"Failed to update key {key}. Response: {response.text}")
+
+
+    def _send_pipeline(self, commands):
+        results = []
+        for i in range(0, len(commands), self.pipeline_size):
+            chunk = commands[i:i + self.pipeline_size]
+            data = json.dumps(chunk)
+            with self.instrumentation.span("vercelkv.pipeline", commands=len(chunk)) as span:
+                response = self.session.post(f"{self.base_url}/pipeline", headers=self._headers(), data=data)
+                span.sent(len(data))
+                span.received(len(response.content))
+                if response.status_code != 200:
+                    span.fail(f"HTTP {response.status_code}")
+
+            if response.status_code != 200:
+                raise Exception(f"Failed to run pipeline of {len(chunk)} commands. Response: {response.text}")
+            results.extend(response.json())
+        return results
+
+
+    def pipeline(self, raise_on_error=True) -> Pipeline:
+        return Pipeline(self, raise_on_error=raise_on_error)
+
+
+    def mget(self, keys):
+        """Returns the values of keys in order, None for keys that are not set"""
+        values = [MISSING] * len(keys)
+        if self.cache:
+            values = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, value in enumerate(values) if value is MISSING]
+        if missing:
+            with self.pipeline() as pipe:
+                for i in missing:
+                    pipe.get(keys[i])
+
+            for i, value in zip(missing, pipe.results):
+                values[i] = value
+
+        return values
+
+
+    def mset(self, items: dict):
+        with self.pipeline() as pipe:
+            for key, value in items.items():
+                pipe.set(key, value)
+        return True
+
+
+    def mdelete(self, keys):
+        with self.pipeline() as pipe:
+            for key in keys:
+                pipe.delete(key)
+        return True
+
+
+    def incr(self, key, amount=1):
+        """Atomically adds amount to the number at key and returns the new value
+
+        Works on keys written in typed mode or by incr itself, a missing key counts as 0.
+        """
+        try:
+            if isinstance(amount, float):
+                return float(self._send_command(["INCRBYFLOAT", key, amount]))
+            return self._send_command(["INCRBY", key, amount])
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
+
+
+    def expire(self, key, seconds: int):
+        """Sets key to expire in seconds, returns False if the key does not exist"""
+        try:
+            return self._send_command(["EXPIRE", key, seconds]) == 1
+        finally:
+            if self.cache:
+                self.cache.invalidate(key)
+
+
+    def hset(self, key, mapping: dict):
+        """Sets fields of the hash at key, values are stored like in typed mode"""
+        args = []
+        for field, value in mapping.items():
+            args += [field, self.codec.encode(value)]
+        return self._send_command(["HSET", key, *args])
+
+
+    def hget(self, key, field):
+        return self.codec.decode(self._send_command(["HGET", key, field]))
+
+
+    def hgetall(self, key) -> dict:
+        return self._decode_hash(self._send_command(["HGETALL", key]))
+
+
+    def _decode_hash(self, result) -> dict:
+        # the REST api returns hashes as a flat [field, value, ...] list
+        if not result:
+            return {}
+        if isinstance(result, dict):
+            return {field: self.codec.decode(value) for field, value in result.items()}
+        return {field: self.codec.decode(value) for field, value in zip(result[::2], result[1::2])}
+
+
+    def hincr(self, key, field, amount: int = 1):
+        """Atomically adds amount to a number field of the hash at key and returns the new value"""
+        return self._send_command(["HINCRBY", key, field, amount])